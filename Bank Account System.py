@@ -1,22 +1,58 @@
 #  Bank Account System
-from datetime import date
+import csv
+import math
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, month-end accruals fall back to plain Python
+    np = None
 
 
 class Loan:
     """Handles loan processing, repayment, and interest tracking."""
+    __slots__ = ('account', 'remaining_loan_due', 'payment_history', 'accrued_month')  # No per-instance __dict__ keeps loans small
     max_loan_limit = 5000  # Prevents excessive loans
     interest_rate = 0.05
 
     def __init__(self, account, amount):
         self.account = account  # object account referred
-        self.remaining_loan_due = amount + (1 + Loan.interest_rate)  # Applying initial interest of 5%
+        self.remaining_loan_due = amount * (1 + Loan.interest_rate)  # Applying initial interest of 5%
         self.payment_history = []
+        self.accrued_month = None  # (year, month) of the last month-end interest accrual
 
-        account.balance += amount  # Granting user the loan to their main balance if eligible when loan object created.
+        account._book(amount, 'Loan')  # Granting user the loan to their main balance if eligible when loan object created.
+        self.journal_state()
 
     def __repr__(self):
         return f'{self.account}'
 
+    @classmethod
+    def _restore(cls, account, remaining_loan_due, payment_history, accrued_month):
+        """Rebuilds a loan from saved state without granting the amount again"""
+        loan = cls.__new__(cls)
+        loan.account = account
+        loan.remaining_loan_due = remaining_loan_due
+        loan.payment_history = payment_history
+        loan.accrued_month = accrued_month
+        return loan
+
+    def journal_state(self, payment=0.0):
+        """Writes the loan's current state to the bank journal (if one is open)"""
+        if GeneralAccount.journal is not None:
+            GeneralAccount.journal.log_loan(self, payment)
+
     def pay_installment(self, amount):
         """Process repayment and apply interest after each installment."""
         if amount <= 0:
@@ -35,17 +71,329 @@ class Loan:
         else:
             self.remaining_loan_due *= (1 + Loan.interest_rate)  # Apply interest AFTER payment
             print(f'Remaining Loan Due: {self.remaining_loan_due:.2f} (Interest Applied)')  # 2 decimal places.
+        self.journal_state(amount)
 
     def get_loan_summary(self):
         """Loan Summary"""
         print(f'Remaining Loan Due: ${self.remaining_loan_due:.2f} "Loan Payment history: {self.payment_history}')
 
+    def what_if(self, installment):
+        """Payoff of this loan if every future installment is the given amount (the loan is not changed)"""
+        return loan_payoff(round(self.remaining_loan_due, 2), Loan.interest_rate, installment)
+
+    def schedule(self, installment):
+        """Full amortisation schedule of this loan for a fixed installment (the loan is not changed)"""
+        return amortisation_schedule(round(self.remaining_loan_due, 2), Loan.interest_rate, installment)
+
+    def installment_needed(self, installments):
+        """Fixed installment that pays this loan off in the given number of installments"""
+        return installment_for(self.remaining_loan_due, Loan.interest_rate, installments)
+
+
+# A loan that follows Loan.pay_installment: each installment is deducted from the amount due and interest is then
+# applied to what is left. With g = 1 + rate and P the installment, the amount due after m installments is
+#     D(m) = g**m * (D0 - A) + A   where A = P * g / rate
+# and the loan is paid off by installment m + 1 for the first m with D(m) <= P.
+LoanPayoff = namedtuple('LoanPayoff', ['installments', 'total_paid', 'total_interest', 'final_payment'])
+ScheduleRow = namedtuple('ScheduleRow', ['number', 'payment', 'interest', 'remaining_loan_due'])
+
+
+def _due_after(due, rate, installment, paid):
+    """Amount due after a number of full installments (closed form)"""
+    if rate == 0:
+        return due - paid * installment
+    growth = (1 + rate) ** paid
+    steady = installment * (1 + rate) / rate
+    return growth * (due - steady) + steady
+
+
+@lru_cache(maxsize=65536)
+def loan_payoff(due, rate, installment):
+    """Number of installments, total paid and total interest to pay off an amount due with a fixed installment.
+    installments is None when the installment does not even cover the interest."""
+    if installment <= 0:
+        raise ValueError('Installment must be greater than zero.')
+    if due <= installment:
+        full = 0
+    elif rate == 0:
+        full = math.ceil((due - installment) / installment)
+    else:
+        steady = installment * (1 + rate) / rate
+        if due >= steady:  # Interest grows the loan at least as fast as the installment pays it
+            return LoanPayoff(None, math.inf, math.inf, None)
+        full = max(0, math.ceil(math.log((steady - installment) / (steady - due)) / math.log(1 + rate)))
+        # Correct for floating point error in the logarithm
+        while full > 0 and _due_after(due, rate, installment, full - 1) <= installment:
+            full -= 1
+        while _due_after(due, rate, installment, full) > installment:
+            full += 1
+    final_payment = _due_after(due, rate, installment, full)
+    total_paid = full * installment + final_payment
+    return LoanPayoff(full + 1, total_paid, total_paid - due, final_payment)
+
+
+def installment_for(due, rate, installments):
+    """Fixed installment that pays off an amount due in exactly the given number of installments"""
+    if installments < 1:
+        raise ValueError('Number of installments must be at least 1.')
+    if rate == 0:
+        return due / installments
+    growth = (1 + rate) ** (installments - 1)
+    return growth * due / (1 + (1 + rate) * (growth - 1) / rate)
+
+
+@lru_cache(maxsize=1024)
+def amortisation_schedule(due, rate, installment):
+    """Tuple of ScheduleRow, one per installment, until the loan is paid off"""
+    payoff = loan_payoff(due, rate, installment)
+    if payoff.installments is None:
+        raise ValueError(f'An installment of ${installment} never pays off ${due:.2f} at {rate:.0%} interest.')
+    rows = []
+    for number in range(1, payoff.installments):
+        left = due - installment
+        due = left * (1 + rate)
+        rows.append(ScheduleRow(number, installment, due - left, due))
+    rows.append(ScheduleRow(payoff.installments, due, 0.0, 0.0))
+    return tuple(rows)
+
+
+def portfolio_report(loans, installments):
+    """Payoff of every loan under each installment scenario.
+    Returns {installment: {'total_interest', 'loans_never_paid_off', 'longest_payoff'}}."""
+    report = {}
+    for installment in installments:
+        total_interest, never_paid_off, longest = 0.0, 0, 0
+        for loan in loans:
+            payoff = loan.what_if(installment)
+            if payoff.installments is None:
+                never_paid_off += 1
+            else:
+                total_interest += payoff.total_interest
+                longest = max(longest, payoff.installments)
+        report[installment] = {'total_interest': total_interest, 'loans_never_paid_off': never_paid_off,
+                               'longest_payoff': longest}
+    return report
+
+
+class TransactionHistory:
+    """Append-only transaction history of an account, stored column by column in typed arrays."""
+    __slots__ = ('__amounts', '__days', '__types', '__net', '__monthly')
+    types = ('Deposit', 'Withdrawal', 'Loan', 'Interest')  # Type codes are positions in this tuple
+    signs = (1, -1, 1, 1)  # Effect of each type on the balance
+
+    def __init__(self):
+        self.__amounts = array('d')
+        self.__days = array('q')  # Dates as date.toordinal() so range queries can use binary search
+        self.__types = array('B')
+        self.__net = array('d', [0.0])  # Prefix sums of signed amounts: __net[i] = balance change of the first i entries
+        self.__monthly = {}  # Key: (year, month), Value: list of totals per type code
+
+    def __len__(self):
+        return len(self.__amounts)
+
+    def __bool__(self):
+        return len(self.__amounts) > 0
+
+    def __getitem__(self, index):
+        """Returns an entry in the same dict format as the old list based history"""
+        return {'Amount': self.__amounts[index], 'Date': str(date.fromordinal(self.__days[index])),
+                'Type': self.types[self.__types[index]]}
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def record(self, amount, kind, on_date=None):
+        """Adds an entry. Entries normally arrive in date order, older dates are inserted in place."""
+        code = self.types.index(kind)
+        on_date = date.today() if on_date is None else on_date
+        if isinstance(on_date, str):
+            on_date = date.fromisoformat(on_date)
+        day = on_date.toordinal()
+        signed = self.signs[code] * amount
+
+        if not self.__days or day >= self.__days[-1]:
+            self.__amounts.append(amount)
+            self.__days.append(day)
+            self.__types.append(code)
+            self.__net.append(self.__net[-1] + signed)
+        else:  # Back-dated entry: insert after entries of the same date and rebuild the prefix sums after it
+            position = bisect_right(self.__days, day)
+            self.__amounts.insert(position, amount)
+            self.__days.insert(position, day)
+            self.__types.insert(position, code)
+            self.__net.insert(position + 1, 0.0)
+            for index in range(position, len(self.__amounts)):
+                self.__net[index + 1] = self.__net[index] + self.signs[self.__types[index]] * self.__amounts[index]
+
+        totals = self.__monthly.setdefault((on_date.year, on_date.month), [0.0] * len(self.types))
+        totals[code] += amount
+
+    def _span(self, start=None, end=None):
+        """Index range [first, last) of entries dated from start to end (both inclusive)"""
+        first = 0 if start is None else bisect_left(self.__days, start.toordinal())
+        last = len(self) if end is None else bisect_right(self.__days, end.toordinal())
+        return first, max(first, last)
+
+    def between(self, start=None, end=None):
+        """Returns the entries dated from start to end (both inclusive)"""
+        first, last = self._span(start, end)
+        return [self[index] for index in range(first, last)]
+
+    def net_change(self, start=None, end=None):
+        """Total effect on the balance of the entries dated from start to end"""
+        first, last = self._span(start, end)
+        return self.__net[last] - self.__net[first]
+
+    def balance_on(self, day, current_balance):
+        """Balance at the end of a day, worked back from the current balance"""
+        _, last = self._span(None, day)
+        return current_balance - (self.__net[-1] - self.__net[last])
+
+    def statement(self, start, end, current_balance):
+        """Returns the entries dated from start to end, each with the running balance after it"""
+        first, last = self._span(start, end)
+        opening = current_balance - self.__net[-1]
+        return [dict(self[index], Balance=opening + self.__net[index + 1]) for index in range(first, last)]
+
+    def dump(self, file):
+        """Writes the columns, prefix sums and monthly totals to a binary file (used by snapshots)"""
+        file.write(struct.pack('<QQ', len(self), len(self.__monthly)))
+        for column in (self.__amounts, self.__days, self.__types, self.__net):
+            column.tofile(file)
+        for (year, month), totals in self.__monthly.items():
+            file.write(struct.pack('<ii', year, month))
+            array('d', totals).tofile(file)
+
+    @classmethod
+    def load(cls, file):
+        """Reads a history written by dump()"""
+        history = cls()
+        count, months = struct.unpack('<QQ', file.read(16))
+        history.__amounts.fromfile(file, count)
+        history.__days.fromfile(file, count)
+        history.__types.fromfile(file, count)
+        history.__net = array('d')
+        history.__net.fromfile(file, count + 1)
+        for _ in range(months):
+            year, month = struct.unpack('<ii', file.read(8))
+            totals = array('d')
+            totals.fromfile(file, len(cls.types))
+            history.__monthly[(year, month)] = totals.tolist()
+        return history
+
+    def monthly_totals(self):
+        """Returns {(year, month): {type: total amount}} from the totals kept while recording"""
+        return {month: dict(zip(self.types, totals)) for month, totals in sorted(self.__monthly.items())}
+
+
+class WithdrawalLimiter:
+    """Thread-safe daily withdrawal limiter, sharded by account number so concurrent withdrawals rarely share a lock."""
+
+    def __init__(self, limit, shards=64, window=None, keep_days=7):
+        self.limit = limit
+        self.window = window  # None: calendar day per date key, timedelta(hours=24): sliding window
+        self.keep_days = keep_days  # Days before the newest date seen whose tallies are kept (settlement files can be out of order)
+        self.__locks = [threading.Lock() for _ in range(shards)]
+        self.__days = [{} for _ in range(shards)]  # Per shard: {date: {account number: amount withdrawn}}
+        self.__newest = [None] * shards  # Per shard: newest date seen, older tallies are dropped relative to it
+        self.__recent = [{} for _ in range(shards)]  # Per shard (sliding window): {account number: [deque of (time, amount), total]}
+
+    def _shard(self, account_number):
+        return hash(account_number) % len(self.__locks)
+
+    def _is_expired(self, shard, day):
+        newest = self.__newest[shard]
+        return newest is not None and day < newest - timedelta(days=self.keep_days)
+
+    def _day_tally(self, shard, day):
+        """Returns the tally of a date, starting a new one when the date is new. Returns None for a date older than
+        the kept days: its tally may have been dropped, and starting it again at zero would reset the limit."""
+        days = self.__days[shard]
+        tally = days.get(day)
+        if tally is None:
+            if self._is_expired(shard, day):
+                return None
+            if self.__newest[shard] is None or day > self.__newest[shard]:
+                self.__newest[shard] = day
+                for old_day in [key for key in days if self._is_expired(shard, key)]:
+                    del days[old_day]
+            tally = days[day] = {}
+        return tally
+
+    def is_expired(self, account_number, day):
+        """True if withdrawals on day can no longer be checked against the limit (the date is too old)"""
+        day = day.date() if isinstance(day, datetime) else day
+        shard = self._shard(account_number)
+        with self.__locks[shard]:
+            return self.window is None and day not in self.__days[shard] and self._is_expired(shard, day)
+
+    def _recent(self, shard, account_number, when):
+        """Returns [entries, total] of an account after expiring entries older than the sliding window"""
+        entry = self.__recent[shard].setdefault(account_number, [deque(), 0])
+        entries, cutoff = entry[0], when - self.window
+        while entries and entries[0][0] <= cutoff:
+            entry[1] -= entries.popleft()[1]
+        return entry
+
+    @staticmethod
+    def _moment(when):
+        """Time for the sliding window: now by default, the start of the day for a plain date"""
+        when = when or datetime.now()
+        if not isinstance(when, datetime):
+            when = datetime.combine(when, datetime.min.time())
+        return when
+
+    def try_withdraw(self, account_number, amount, when=None):
+        """Reserves amount against the limit. Returns False (reserving nothing) if it would exceed the limit."""
+        shard = self._shard(account_number)
+        with self.__locks[shard]:
+            if self.window is None:
+                day = when or date.today()
+                tally = self._day_tally(shard, day.date() if isinstance(day, datetime) else day)
+                if tally is None:
+                    return False
+                withdrawal_so_far = tally.get(account_number, 0)
+                if withdrawal_so_far + amount > self.limit:
+                    return False
+                tally[account_number] = withdrawal_so_far + amount
+                return True
+
+            when = self._moment(when)
+            entry = self._recent(shard, account_number, when)
+            if entry[1] + amount > self.limit:
+                return False
+            entry[0].append((when, amount))
+            entry[1] += amount
+            return True
+
+    def withdrawn(self, account_number, when=None):
+        """Amount withdrawn by an account on a date (or within the sliding window ending at when)"""
+        shard = self._shard(account_number)
+        with self.__locks[shard]:
+            if self.window is None:
+                day = when or date.today()
+                day = day.date() if isinstance(day, datetime) else day
+                return self.__days[shard].get(day, {}).get(account_number, 0)
+            return self._recent(shard, account_number, self._moment(when))[1]
+
+    def snapshot(self, day=None):
+        """Returns withdrawals of a date in the format {'date': '2025-03-24', account number: amount, ...}"""
+        day = day or date.today()
+        withdrawals = {'date': str(day)}
+        for lock, days in zip(self.__locks, self.__days):
+            with lock:
+                withdrawals.update(days.get(day, {}))
+        return withdrawals
+
 
 class GeneralAccount:
     """Creates a General Account"""
+    __slots__ = ('name', 'balance', '__account_number', 'transaction_history', '__is_freeze', 'active_loan')
     __last_account_number = 1000  # Private class variable to store the last assigned account number
     __max_daily_limit = 2000
-    __withdrawal_today = {}  # format E.g {date : 24-03-2025, user1: '2000', user2: '200'}
+    __limiter = WithdrawalLimiter(__max_daily_limit)  # Shared by every account, tracks withdrawals per day
+    journal = None  # BankJournal recording every change, set by BankJournal.open()
 
     @classmethod
     def get_max_daily_withdrawal_limit(cls):
@@ -55,18 +403,17 @@ class GeneralAccount:
     @classmethod
     def get_withdrawals_of_today(cls):
         """Provides read-only access to withdrawal data history of users of a specific day"""
-        return cls.__withdrawal_today.copy()  # Returns a copy of dictionary to prevent modification
+        return cls.__limiter.snapshot()  # Returns a new dictionary to prevent modification
+
+    @classmethod
+    def withdrawal_limiter(cls):
+        """Getter for the limiter shared by all accounts (used by batch settlement)"""
+        return cls.__limiter
 
     @classmethod
     def check_daily_limit(cls, amount, account_number):
         """Checks if a user exceeds the daily maximum withdrawal limit"""
-        date_today = str(date.today())
-        if cls.__withdrawal_today.get('date') != date_today:  # get function to avoid program from crashing.
-            cls.__withdrawal_today = {'date': date_today}  # The withdrawal data resets on a new day
-
-        withdrawal_so_far = cls.__withdrawal_today.get(account_number, 0)  # $0 if no withdrawal made my user in a day.
-        if withdrawal_so_far + amount <= cls.__max_daily_limit:
-            cls.__withdrawal_today[account_number] = withdrawal_so_far + amount  # Appends/Update withdrawal amount.
+        if cls.__limiter.try_withdraw(account_number, amount):  # Records the withdrawal if it is within the limit
             return True
         else:
             print(f'⚠️Warning! Daily withdrawal limit of ${cls.__max_daily_limit} exceeded.')
@@ -78,6 +425,7 @@ class GeneralAccount:
         if admin_pass == 'secure_admin_pass':  # ✅ Admin authentication
             if isinstance(new_limit, (int, float)) and new_limit > 2000:  # ✅ Ensure new limit is valid
                 cls.__max_daily_limit = new_limit
+                cls.__limiter.limit = new_limit
                 print(f"New withdrawal limit set to ${cls.__max_daily_limit}")
             else:
                 print('New value for daily maximum withdrawal limit should be greater than $2000')
@@ -91,6 +439,11 @@ class GeneralAccount:
         cls.__last_account_number += 1
         return account_number
 
+    @classmethod
+    def next_account_number(cls):
+        """Returns the account number the next account will get, without using it up"""
+        return cls.__last_account_number
+
     @classmethod
     def set_account_number(cls, new_value):
         """Setter method to modify the last account number (if needed)."""
@@ -99,15 +452,21 @@ class GeneralAccount:
         else:
             raise ValueError('Setting a value for the last Account number must be greater than the current value.')
 
+    def _set_freeze(self, is_freeze):
+        """Sets the frozen flag and writes it to the journal (if one is open)"""
+        self.__is_freeze = is_freeze
+        if GeneralAccount.journal is not None:
+            GeneralAccount.journal.log_freeze(self)
+
     def freeze_account(self):
         """Allows freezing the account"""
-        self.__is_freeze = True
+        self._set_freeze(True)
         print('The account is frozen')
 
     def unfreeze_account(self):
         """Allows unfreezing the account"""
         if self.__is_freeze:
-            self.__is_freeze = False
+            self._set_freeze(False)
             print('The account is unfrozen')
         else:
             print('The account is already unfrozen!')
@@ -116,10 +475,30 @@ class GeneralAccount:
         self.name = name
         self.balance = balance
         self.__account_number = GeneralAccount.get_account_number()
-        self.transaction_history = []
+        self.transaction_history = TransactionHistory()
         self.__is_freeze = False  # By default, account should be active when created.
         self.active_loan = None  # Initially no active loan when user creates the account
 
+    @classmethod
+    def _restore(cls, account_number, name, balance, is_freeze):
+        """Rebuilds an account from saved state without using up a new account number"""
+        account = cls.__new__(cls)
+        account.name = name
+        account.balance = balance
+        account.__account_number = account_number
+        account.transaction_history = TransactionHistory()
+        account.__is_freeze = is_freeze
+        account.active_loan = None
+        return account
+
+    def _book(self, amount, kind, on_date=None):
+        """Changes the balance, records the transaction and writes it to the journal (if one is open)"""
+        on_date = on_date or date.today()
+        self.balance += TransactionHistory.signs[TransactionHistory.types.index(kind)] * amount
+        self.transaction_history.record(amount, kind, on_date)
+        if GeneralAccount.journal is not None:
+            GeneralAccount.journal.log_post(self, kind, amount, on_date)
+
     def apply_for_loan(self, amount):
         """Allow customers to request a loan if they are eligible."""
         if amount > Loan.max_loan_limit:
@@ -167,10 +546,7 @@ class GeneralAccount:
             print('Transaction denied! Your account is frozen.')
             return
         if amount > 0:
-            self.balance += amount
-            current_date = str(date.today())
-            transaction = {'Amount': amount, 'Date': current_date, 'Type': 'Deposit'}
-            self.transaction_history.append(transaction)
+            self._book(amount, 'Deposit')
             print(f'${amount} has been successfully deposited in your account')
         else:
             print('Transaction not possible! The amount of deposit must be more than $0')
@@ -181,6 +557,24 @@ class GeneralAccount:
             return False
         return True
 
+    def assess_withdrawal(self, amount):
+        """Checks a withdrawal against the account rules without prompting. Returns (amount to debit, reason if denied)"""
+        if amount <= 0:
+            return 0, 'Withdrawal amount must be more than $0'
+        if self.is_freeze:
+            return 0, 'Account is frozen'
+        if not self.check_amount(amount):
+            return 0, 'Insufficient funds'
+        return amount, None
+
+    def post_deposit(self, amount, on_date):
+        """Books a deposit without any prompts or prints (used by batch settlement)"""
+        self._book(amount, 'Deposit', on_date)
+
+    def post_withdrawal(self, amount, on_date):
+        """Books an already assessed withdrawal without any prompts or prints (used by batch settlement)"""
+        self._book(amount, 'Withdrawal', on_date)
+
     def verify_user(self):
         """Helper method to verify the user (Needed for all types of account)"""
         try:
@@ -198,9 +592,7 @@ class GeneralAccount:
         while True:
             authenticate = input(f'Do you wish to proceed and and withdraw from this account? ("Yes"/"No"): ').strip()
             if authenticate.lower() == 'yes':
-                self.balance -= amount
-                current_date = str(date.today())
-                self.transaction_history.append({'Amount': amount, 'Date': current_date, 'Type': 'Withdrawal'})
+                self._book(amount, 'Withdrawal')
                 print(f'Transaction Successful! Current Balance: {self.balance}')
                 return True
             elif authenticate.lower() == 'no':
@@ -237,30 +629,68 @@ class GeneralAccount:
             for index, item in enumerate(self.transaction_history, start=1):
                 print(f'{index}. Amount: {item["Amount"]}, Date: {item["Date"]}, Type: {item["Type"]}')
 
+    def balance_on(self, day):
+        """Returns the account balance at the end of a given date"""
+        return self.transaction_history.balance_on(day, self.balance)
+
+    def view_statement(self, start, end):
+        """Displays the transactions between two dates with the running balance"""
+        entries = self.transaction_history.statement(start, end, self.balance)
+        if not entries:
+            print(f'No transactions between {start} and {end}.')
+            return
+        print(f'----------STATEMENT {start} to {end}-------------')
+        for index, item in enumerate(entries, start=1):
+            print(f'{index}. Amount: {item["Amount"]}, Date: {item["Date"]}, Type: {item["Type"]}, Balance: {item["Balance"]:.2f}')
+
 
 class SavingAccount(GeneralAccount):
     """Creates a Savings Account"""
-    months_since_last_interest = 0
+    __slots__ = ('interest_month',)
     withdrawal = 0  # User will be allowed to withdraw 6 times per month
     last_interest_applied_month = 0
     min_balance = 25
     interest = 1.01
+    max_withdrawals_per_month = 6
 
     def __init__(self, name, balance):
         if balance < SavingAccount.min_balance:
             raise ValueError(f"Initial balance must be at least ${SavingAccount.min_balance}.")
         else:
             super().__init__(name, balance)
+        self.interest_month = None  # (year, month) interest was last applied, so it is applied once per account per month
 
     def __repr__(self):
         return f'Name: {self.name} Account No: {self.account_number} Balance: {self.balance} Account_Type: Savings'
 
     def apply_interest(self):
         """Applies a monthly interest"""
-        current_month = date.today().month
-        if current_month != SavingAccount.months_since_last_interest:
-            self.balance = self.balance * self.interest
-            SavingAccount.months_since_last_interest = current_month
+        today = date.today()
+        current_month = (today.year, today.month)
+        if current_month != self.interest_month:
+            self._book(self.balance * (self.interest - 1), 'Interest')
+            self.set_interest_month(current_month)
+
+    @classmethod
+    def _restore(cls, account_number, name, balance, is_freeze):
+        account = super()._restore(account_number, name, balance, is_freeze)
+        account.interest_month = None
+        return account
+
+    def set_interest_month(self, month):
+        """Marks the (year, month) interest was applied for and writes it to the journal (if one is open)"""
+        self.interest_month = month
+        if GeneralAccount.journal is not None:
+            GeneralAccount.journal.log_interest_month(self)
+
+    def assess_withdrawal(self, amount):
+        """Same as GeneralAccount but the balance must stay above the minimum balance"""
+        debit, reason = super().assess_withdrawal(amount)
+        if reason:
+            return debit, reason
+        if self.balance - amount < self.min_balance:
+            return 0, f'Balance would fall below the minimum balance of ${self.min_balance}'
+        return debit, None
 
     def withdraw_money(self, amount):
         """Overridden, this method functions differently than other withdraw methods"""
@@ -280,7 +710,7 @@ class SavingAccount(GeneralAccount):
         if SavingAccount.last_interest_applied_month != current_month:
             SavingAccount.last_interest_applied_month += 1
             SavingAccount.withdrawal = 0
-        if SavingAccount.last_interest_applied_month == current_month and SavingAccount.withdrawal == 6:
+        if SavingAccount.last_interest_applied_month == current_month and SavingAccount.withdrawal == self.max_withdrawals_per_month:
             print('Transaction Denied! You can not withdraw money more than 6 times in a month!')
             return
         if self.check_amount(amount):
@@ -298,6 +728,9 @@ class SavingAccount(GeneralAccount):
 
 class CheckingAccount(GeneralAccount):
     """Creates a Checking Account"""
+    __slots__ = ()
+    overdraft_fee = 50  # Charged when the balance is or will be negative after a withdrawal
+    overdraft_limit = -3000
 
     def __init__(self, name, balance):
         if balance <= -3000:
@@ -308,10 +741,23 @@ class CheckingAccount(GeneralAccount):
     def __repr__(self):
         return f'Name: {self.name} Account No: {self.account_number} Balance: {self.balance} Account_Type: Checking'
 
+    def assess_withdrawal(self, amount):
+        """Allows overdrafts down to the overdraft limit, adding the overdraft fee to the debit"""
+        if amount <= 0:
+            return 0, 'Withdrawal amount must be more than $0'
+        if self.is_freeze:
+            return 0, 'Account is frozen'
+        balance_after_withdrawal = self.balance - amount
+        if balance_after_withdrawal >= 0:
+            return amount, None
+        if balance_after_withdrawal - self.overdraft_fee < self.overdraft_limit:
+            return 0, f'Exceeds overdraft limit of ${-self.overdraft_limit:,}'
+        return amount + self.overdraft_fee, None
+
     def withdraw_money(self, amount):  # Overdraft Protection
         """Overridden, this method functions differently than other withdraw methods"""
-        charge_fee = 50  # Charges $50 if user wants to withdraw and if their balance is negative or will be negative.
-        limit = -3000  # Overdraft Limit
+        charge_fee = self.overdraft_fee  # Charges $50 if user wants to withdraw and if their balance is negative or will be negative.
+        limit = self.overdraft_limit  # Overdraft Limit
         # Case 1 - No fee charged if balance after withdrawal is positive (more than $0)
         # Case 2 - Fee charged if : Balance after withdrawal is negative (below $0)
         # Whatever the user withdraws must never exceed the withdrawal limit which is $3,000
@@ -375,3 +821,495 @@ class CheckingAccount(GeneralAccount):
 
 
 
+
+
+class Bank:
+    """Registry that owns every account, with O(1) lookup by account number and indexes by holder name and type."""
+    account_types = {GeneralAccount: 'General', SavingAccount: 'Savings', CheckingAccount: 'Checking'}
+
+    def __init__(self):
+        self.__accounts = {}  # Key: account number, Value: account object
+        self.__by_name = {}  # Key: holder name (lower case), Value: {account number: account object}
+        self.__by_type = {account_type: {} for account_type in self.account_types.values()}
+
+    def __len__(self):
+        return len(self.__accounts)
+
+    def __contains__(self, account_number):
+        return account_number in self.__accounts
+
+    def __iter__(self):
+        return iter(self.__accounts.values())
+
+    def __repr__(self):
+        return f'Bank: {len(self)} account(s)'
+
+    @classmethod
+    def type_of(cls, account):
+        """Returns the account type name (General/Savings/Checking) of an account object"""
+        return cls.account_types[type(account)]
+
+    def open_account(self, account_type, name, balance):
+        """Creates an account of the given type ('General', 'Savings' or 'Checking') and registers it"""
+        for account_class, type_name in self.account_types.items():
+            if type_name.lower() == account_type.lower():
+                return self.add_account(account_class(name, balance))
+        raise ValueError(f'Unknown account type: {account_type}. Choose from {", ".join(self.account_types.values())}')
+
+    def add_account(self, account):
+        """Registers an existing account object"""
+        if account.account_number in self.__accounts:
+            raise ValueError(f'Account number {account.account_number} is already registered.')
+        self.__accounts[account.account_number] = account
+        self.__by_name.setdefault(account.name.lower(), {})[account.account_number] = account
+        self.__by_type[self.type_of(account)][account.account_number] = account
+        if GeneralAccount.journal is not None and GeneralAccount.journal.bank is self:
+            GeneralAccount.journal.log_open(account)
+        return account
+
+    def close_account(self, account_number):
+        """Removes an account from the registry and returns it"""
+        account = self.__accounts.pop(account_number, None)
+        if account is None:
+            raise KeyError(f'No account with the account number {account_number}')
+        same_name = self.__by_name[account.name.lower()]
+        del same_name[account_number]
+        if not same_name:
+            del self.__by_name[account.name.lower()]
+        del self.__by_type[self.type_of(account)][account_number]
+        if GeneralAccount.journal is not None and GeneralAccount.journal.bank is self:
+            GeneralAccount.journal.log_close(account_number)
+        return account
+
+    def get(self, account_number):
+        """Returns the account with this number or None"""
+        return self.__accounts.get(account_number)
+
+    def find_by_name(self, name):
+        """Returns every account held by this name (case-insensitive)"""
+        return list(self.__by_name.get(name.lower(), {}).values())
+
+    def accounts_of_type(self, account_type):
+        """Returns every account of a type ('General', 'Savings' or 'Checking')"""
+        return list(self.__by_type[account_type.capitalize()].values())
+
+    def rename_holder(self, account_number, new_name):
+        """Changes the holder name of an account and keeps the name index up to date"""
+        account = self.__accounts[account_number]
+        same_name = self.__by_name[account.name.lower()]
+        del same_name[account_number]
+        if not same_name:
+            del self.__by_name[account.name.lower()]
+        account.name = new_name
+        self.__by_name.setdefault(new_name.lower(), {})[account_number] = account
+        if GeneralAccount.journal is not None and GeneralAccount.journal.bank is self:
+            GeneralAccount.journal.log_rename(account)
+
+
+def _month_code(month):
+    """Packs a (year, month) tuple into one int for binary files (-1 for None)"""
+    return -1 if month is None else month[0] * 12 + month[1] - 1
+
+
+def _month_from_code(code):
+    """Unpacks a month packed by _month_code()"""
+    if code < 0:
+        return None
+    year, month_index = divmod(code, 12)
+    return year, month_index + 1
+
+
+class BankJournal:
+    """Write-ahead log and snapshots that let a Bank survive restarts.
+
+    Every change is appended to the current log segment and fsynced in groups (group commit).
+    snapshot() writes the whole bank to one binary file and starts a new segment, so recovery
+    loads the snapshot and replays only the segments written after it."""
+    OPEN, POST, LOAN, FREEZE, CLOSE, RENAME, INTEREST_MONTH = range(1, 8)  # Record types
+    __header = struct.Struct('<II')  # Payload length, CRC32 of payload
+    __snapshot_magic = b'BANKSNP1'
+    __account_classes = list(Bank.account_types)  # Account type codes are positions in this list
+
+    def __init__(self, directory, group_size=256, snapshot_every=100_000, fsync=True):
+        self.directory = directory
+        self.bank = Bank()
+        self.group_size = group_size  # Records per fsync
+        self.snapshot_every = snapshot_every  # Records between automatic snapshots, bounds recovery time
+        self.fsync = fsync
+        self.__buffer = bytearray()
+        self.__pending = 0
+        self.__since_snapshot = 0
+        self.__segment = 0
+        self.__file = None
+
+    @classmethod
+    def open(cls, directory, **options):
+        """Recovers the bank stored in a directory (empty if new) and starts journaling every change to it"""
+        os.makedirs(directory, exist_ok=True)
+        journal = cls(directory, **options)
+        GeneralAccount.journal = None  # Replayed changes must not be logged again
+        journal._recover()
+        GeneralAccount.journal = journal
+        return journal
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f'wal.{segment:08d}.log')
+
+    def _segments(self):
+        """Numbers of the log segments present in the directory, oldest first"""
+        return sorted(int(name[4:12]) for name in os.listdir(self.directory)
+                      if name.startswith('wal.') and name.endswith('.log'))
+
+    def _recover(self):
+        start = self._load_snapshot()
+        for segment in self._segments():
+            if segment < start:  # Left over from a crash right after a snapshot
+                os.remove(self._segment_path(segment))
+                continue
+            self._replay(self._segment_path(segment))
+            self.__segment = segment + 1
+        self.__segment = max(self.__segment, start)
+        self.__file = open(self._segment_path(self.__segment), 'ab')
+
+    def _replay(self, path):
+        """Applies every complete record of a segment and cuts off a torn or corrupt tail"""
+        with open(path, 'rb') as file:
+            data = file.read()
+        offset, header_size = 0, self.__header.size
+        while offset + header_size <= len(data):
+            length, checksum = self.__header.unpack_from(data, offset)
+            payload = data[offset + header_size:offset + header_size + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            self._apply(payload)
+            offset += header_size + length
+            self.__since_snapshot += 1
+        if offset < len(data):
+            with open(path, 'r+b') as file:
+                file.truncate(offset)
+
+    def _apply(self, payload):
+        """Replays one record"""
+        op, body = payload[0], payload[1:]
+        if op == self.OPEN:
+            account_number, type_code, balance, is_freeze = struct.unpack_from('<qBd?', body)
+            name = body[struct.calcsize('<qBd?'):].decode()
+            account_class = self.__account_classes[type_code]
+            self.bank.add_account(account_class._restore(account_number, name, balance, is_freeze))
+            if account_number >= GeneralAccount.next_account_number():
+                GeneralAccount.set_account_number(account_number + 1)
+            return
+
+        account = self.bank.get(struct.unpack_from('<q', body)[0])
+        if account is None:  # Change to an account that was never opened in this bank
+            return
+        if op == self.POST:
+            _, type_code, amount, day = struct.unpack('<qBdq', body)
+            account._book(amount, TransactionHistory.types[type_code], date.fromordinal(day))
+        elif op == self.LOAN:
+            _, remaining_loan_due, payment, accrued = struct.unpack('<qddi', body)
+            loan = account.active_loan or Loan._restore(account, 0.0, [], None)
+            loan.remaining_loan_due = remaining_loan_due
+            loan.accrued_month = _month_from_code(accrued)
+            if payment:
+                loan.payment_history.append(payment)
+            account.active_loan = loan if remaining_loan_due > 0 else None
+        elif op == self.FREEZE:
+            account._set_freeze(struct.unpack('<q?', body)[1])
+        elif op == self.CLOSE:
+            self.bank.close_account(account.account_number)
+        elif op == self.RENAME:
+            self.bank.rename_holder(account.account_number, body[8:].decode())
+        elif op == self.INTEREST_MONTH:
+            account.set_interest_month(_month_from_code(struct.unpack('<qi', body)[1]))
+
+    def _log(self, op, body):
+        payload = bytes((op,)) + body
+        self.__buffer += self.__header.pack(len(payload), zlib.crc32(payload)) + payload
+        self.__pending += 1
+        self.__since_snapshot += 1
+        if self.__pending >= self.group_size:
+            self.commit()
+
+    def log_open(self, account):
+        type_code = self.__account_classes.index(type(account))
+        self._log(self.OPEN, struct.pack('<qBd?', account.account_number, type_code, account.balance, account.is_freeze)
+                  + account.name.encode())
+
+    def log_post(self, account, kind, amount, on_date):
+        type_code = TransactionHistory.types.index(kind)
+        self._log(self.POST, struct.pack('<qBdq', account.account_number, type_code, amount, on_date.toordinal()))
+
+    def log_loan(self, loan, payment):
+        self._log(self.LOAN, struct.pack('<qddi', loan.account.account_number, loan.remaining_loan_due, payment,
+                                         _month_code(loan.accrued_month)))
+
+    def log_freeze(self, account):
+        self._log(self.FREEZE, struct.pack('<q?', account.account_number, account.is_freeze))
+
+    def log_close(self, account_number):
+        self._log(self.CLOSE, struct.pack('<q', account_number))
+
+    def log_rename(self, account):
+        self._log(self.RENAME, struct.pack('<q', account.account_number) + account.name.encode())
+
+    def log_interest_month(self, account):
+        self._log(self.INTEREST_MONTH, struct.pack('<qi', account.account_number, _month_code(account.interest_month)))
+
+    def commit(self):
+        """Writes buffered records to the log and fsyncs them. Takes a snapshot when one is due."""
+        if self.__buffer:
+            self.__file.write(self.__buffer)
+            self.__file.flush()
+            if self.fsync:
+                os.fsync(self.__file.fileno())
+            self.__buffer.clear()
+            self.__pending = 0
+        if self.__since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Writes the whole bank to snapshot.bin, starts a new log segment and deletes the old ones"""
+        self.__since_snapshot = 0
+        self.commit()
+        self.__file.close()
+        self.__segment += 1
+
+        path = os.path.join(self.directory, 'snapshot.bin')
+        with open(path + '.tmp', 'wb') as file:
+            file.write(self.__snapshot_magic)
+            file.write(struct.pack('<qqq', self.__segment, GeneralAccount.next_account_number(), len(self.bank)))
+            for account in self.bank:
+                name = account.name.encode()
+                file.write(struct.pack('<qBd?iI', account.account_number, self.__account_classes.index(type(account)),
+                                       account.balance, account.is_freeze,
+                                       _month_code(getattr(account, 'interest_month', None)), len(name)) + name)
+                account.transaction_history.dump(file)
+                loan = account.active_loan
+                if loan is None:
+                    file.write(b'\0')
+                else:
+                    file.write(b'\1' + struct.pack('<diI', loan.remaining_loan_due, _month_code(loan.accrued_month),
+                                                   len(loan.payment_history)))
+                    array('d', loan.payment_history).tofile(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + '.tmp', path)  # Atomic, a crash leaves either the old or the new snapshot
+
+        self.__file = open(self._segment_path(self.__segment), 'ab')
+        for segment in self._segments():
+            if segment < self.__segment:
+                os.remove(self._segment_path(segment))
+
+    def _load_snapshot(self):
+        """Loads snapshot.bin (if any) into the bank and returns the first log segment to replay"""
+        path = os.path.join(self.directory, 'snapshot.bin')
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as file:
+            if file.read(len(self.__snapshot_magic)) != self.__snapshot_magic:
+                raise ValueError(f'{path} is not a bank snapshot')
+            start, next_account_number, count = struct.unpack('<qqq', file.read(24))
+            record = struct.Struct('<qBd?iI')
+            for _ in range(count):
+                account_number, type_code, balance, is_freeze, interest_month, name_length = record.unpack(file.read(record.size))
+                account_class = self.__account_classes[type_code]
+                account = account_class._restore(account_number, file.read(name_length).decode(), balance, is_freeze)
+                if isinstance(account, SavingAccount):
+                    account.interest_month = _month_from_code(interest_month)
+                account.transaction_history = TransactionHistory.load(file)
+                if file.read(1) == b'\1':
+                    remaining_loan_due, accrued, payments = struct.unpack('<diI', file.read(16))
+                    payment_history = array('d')
+                    payment_history.fromfile(file, payments)
+                    account.active_loan = Loan._restore(account, remaining_loan_due, payment_history.tolist(),
+                                                        _month_from_code(accrued))
+                self.bank.add_account(account)
+        if next_account_number > GeneralAccount.next_account_number():
+            GeneralAccount.set_account_number(next_account_number)
+        return start
+
+    def close(self):
+        """Commits buffered records and stops journaling"""
+        self.commit()
+        self.__file.close()
+        if GeneralAccount.journal is self:
+            GeneralAccount.journal = None
+
+
+Transaction = namedtuple('Transaction', ['account_number', 'type', 'amount', 'date'])
+TransactionResult = namedtuple('TransactionResult', ['index', 'account_number', 'type', 'amount', 'status', 'reason', 'balance'])
+BatchSummary = namedtuple('BatchSummary', ['processed', 'applied', 'rejected', 'seconds', 'per_second'])
+MalformedRecord = namedtuple('MalformedRecord', ['row', 'reason'])  # A settlement row that could not be parsed
+
+
+def read_transactions(file):
+    """Streams Transaction records from a CSV file object with rows: account number, type, amount, date (YYYY-MM-DD)"""
+    for row in csv.reader(file):
+        if not row or row[0].strip().lower() in ('account', 'account_number'):  # Skip blank lines and a header row
+            continue
+        if len(row) != 4:
+            yield MalformedRecord(row, f'expected 4 columns, got {len(row)}')
+            continue
+        account_number, kind, amount, on_date = row
+        try:
+            transaction = Transaction(int(account_number), kind.strip(), float(amount), date.fromisoformat(on_date.strip()))
+        except ValueError as error:  # Bad account number, amount or date: reject the row, keep settling the rest
+            yield MalformedRecord(row, str(error))
+            continue
+        if not math.isfinite(transaction.amount):
+            yield MalformedRecord(row, f'amount is not a number: {amount}')
+            continue
+        yield transaction
+
+
+class BatchLedger:
+    """Settles deposits and withdrawals in bulk (e.g. a nightly settlement file) without any input() prompts."""
+
+    def __init__(self, accounts, limiter=None):
+        # A Bank is used directly for lookups, any other iterable of accounts gets indexed by account number
+        self.accounts = accounts if isinstance(accounts, Bank) else {account.account_number: account for account in accounts}
+        self.limiter = limiter or GeneralAccount.withdrawal_limiter()  # Same daily limit as interactive withdrawals
+        self.__monthly_withdrawals = {}  # Savings withdrawals per (year, month, account number)
+        self.summary = None  # Summary of the most recent run
+
+    def _apply(self, index, record):
+        """Applies one record and returns its TransactionResult"""
+        if isinstance(record, MalformedRecord):
+            return TransactionResult(index, None, None, None, 'Rejected', f'Malformed row: {record.reason}', None)
+        account_number, kind, amount, on_date = record
+        if isinstance(on_date, str):
+            on_date = date.fromisoformat(on_date)
+        kind = kind.capitalize()
+        account = self.accounts.get(account_number)
+
+        def result(status, reason=None):
+            return TransactionResult(index, account_number, kind, amount, status, reason,
+                                     account.balance if account else None)
+
+        if account is None:
+            return result('Rejected', 'Unknown account number')
+
+        if kind == 'Deposit':
+            if account.is_freeze:
+                return result('Rejected', 'Account is frozen')
+            if amount <= 0:
+                return result('Rejected', 'Deposit amount must be more than $0')
+            account.post_deposit(amount, on_date)
+            return result('Applied')
+
+        if kind != 'Withdrawal':
+            return result('Rejected', f'Unknown transaction type: {kind}')
+
+        debit, reason = account.assess_withdrawal(amount)
+        if reason:
+            return result('Rejected', reason)
+
+        month_key = (on_date.year, on_date.month, account_number)
+        if isinstance(account, SavingAccount):
+            if self.__monthly_withdrawals.get(month_key, 0) >= account.max_withdrawals_per_month:
+                return result('Rejected', f'More than {account.max_withdrawals_per_month} withdrawals this month')
+
+        if not self.limiter.try_withdraw(account_number, amount, on_date):
+            if self.limiter.is_expired(account_number, on_date):
+                return result('Rejected', f'Date is more than {self.limiter.keep_days} days before the newest withdrawal')
+            return result('Rejected', f'Daily withdrawal limit of ${self.limiter.limit} exceeded')
+
+        if isinstance(account, SavingAccount):
+            self.__monthly_withdrawals[month_key] = self.__monthly_withdrawals.get(month_key, 0) + 1
+        account.post_withdrawal(debit, on_date)
+        return result('Applied')
+
+    def iter_settle(self, records):
+        """Yields a TransactionResult per record as it is applied, so large streams never have to fit in memory"""
+        applied = rejected = 0
+        start = time.perf_counter()
+        for index, record in enumerate(records):
+            outcome = self._apply(index, record)
+            if outcome.status == 'Applied':
+                applied += 1
+            else:
+                rejected += 1
+            yield outcome
+        seconds = time.perf_counter() - start
+        processed = applied + rejected
+        self.summary = BatchSummary(processed, applied, rejected, seconds, processed / seconds if seconds else 0.0)
+
+    def settle(self, records):
+        """Applies every record and returns (list of TransactionResult, BatchSummary)"""
+        results = list(self.iter_settle(records))
+        return results, self.summary
+
+
+AccrualRecord = namedtuple('AccrualRecord', ['account_number', 'month', 'kind', 'before', 'after'])
+
+
+def _compound(values, factor):
+    """Multiplies every value by factor in one pass (NumPy when available). Only this arithmetic is batched:
+    balances stay on the account objects, so posting the results is still one Python step per account."""
+    if np is not None:
+        return (np.frombuffer(values, dtype=np.float64) * factor).tolist()
+    return [value * factor for value in values]
+
+
+def _not_accrued(last_month, month_key):
+    """True if month_key comes after the last accrued (year, month), so no month is ever accrued twice"""
+    return last_month is None or month_key > last_month
+
+
+def month_end_accrual(accounts, year, month):
+    """Applies one month of savings interest and loan interest to every account (a Bank or any iterable of accounts).
+    Accounts and loans already accrued for this month or a later one are skipped, so re-running a month (or an
+    earlier one) changes nothing.
+    The interest is worked out for all accounts at once, then booked (history and journal) account by account,
+    so the run stays O(accounts) in Python. Returns a list of AccrualRecord for auditing."""
+    month_key = (year, month)
+    month_end = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    savings, loans = [], []
+    for account in accounts:
+        if isinstance(account, SavingAccount) and _not_accrued(account.interest_month, month_key):
+            savings.append(account)
+        if account.active_loan is not None and _not_accrued(account.active_loan.accrued_month, month_key):
+            loans.append(account.active_loan)
+
+    records = []
+    balances = array('d', (account.balance for account in savings))
+    for account, before, after in zip(savings, balances, _compound(balances, SavingAccount.interest)):
+        account._book(after - before, 'Interest', month_end)
+        account.set_interest_month(month_key)
+        records.append(AccrualRecord(account.account_number, month_key, 'Savings Interest', before, after))
+
+    dues = array('d', (loan.remaining_loan_due for loan in loans))
+    for loan, before, after in zip(loans, dues, _compound(dues, 1 + Loan.interest_rate)):
+        loan.remaining_loan_due = after
+        loan.accrued_month = month_key
+        loan.journal_state()
+        records.append(AccrualRecord(loan.account.account_number, month_key, 'Loan Interest', before, after))
+    return records
+
+
+def benchmark_limiter(worker_counts=(1, 2, 4, 8), shard_counts=(1, 64), operations=200_000, accounts=10_000):
+    """Measures WithdrawalLimiter throughput from a thread pool for different worker and shard counts"""
+    account_numbers = [random.randrange(accounts) for _ in range(operations)]
+    print(f'{"Shards":>7} {"Workers":>8} {"Ops/s":>12}')
+    for shards in shard_counts:
+        for workers in worker_counts:
+            limiter = WithdrawalLimiter(limit=10 ** 9, shards=shards)
+            chunks = [account_numbers[index::workers] for index in range(workers)]
+            today = date.today()
+
+            def run(chunk):
+                for account_number in chunk:
+                    limiter.try_withdraw(account_number, 1, today)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(run, chunks))
+            seconds = time.perf_counter() - start
+
+            # No lost updates: every unit withdrawn must be accounted for
+            assert sum(value for key, value in limiter.snapshot(today).items() if key != 'date') == operations
+            print(f'{shards:>7} {workers:>8} {operations / seconds:>12,.0f}')
+
+
+# benchmark_limiter()
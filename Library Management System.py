@@ -1,13 +1,44 @@
-from datetime import datetime, timedelta, date
+import csv
+import heapq
+import io
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import threading
+import time
+from collections import deque, namedtuple
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, date
+from itertools import islice
+
+CATEGORIES = frozenset({'FICTION', 'NON-FICTION'})  # Book categories accepted by the Library
 
 
 class Book:
-    def __init__(self, title, author, isbn, category):
+    def __init__(self, title, author, isbn, category, copies=1):
         self.title = title
         self.author = author
         self.isbn = isbn
-        self.status = 'Available'
+        self._index = None  # Search index of the Library holding this book, kept in sync when the status changes
+        self.__status = 'Available'
         self.category = category.upper()
+        self.copies = copies  # Number of copies of this title the Library owns
+        self.__available = copies  # Copies on the shelf (not borrowed or held for a reservation)
+
+    @property
+    def status(self):
+        return self.__status
+
+    @status.setter
+    def status(self, new_status):
+        old_status = self.__status
+        self.__status = new_status
+        if self._index is not None and old_status != new_status:
+            self._index.update_status(self, old_status)
 
     def __str__(self):
         return f"📘 {self.title} by {self.author}"  # Nice for user display
@@ -15,15 +46,24 @@ class Book:
     def __repr__(self):
         return f"Book('{self.title}', '{self.author}, {self.isbn}, {self.category}')"  # Better for debugging
 
+    @property
+    def available_copies(self):
+        return self.__available
+
     def borrow_book(self):
-        if self.status == 'Borrowed':
+        """Takes one copy off the shelf. The status becomes 'Borrowed' when no copies are left."""
+        if self.__available == 0:
             return False
-        self.status = 'Borrowed'
+        self.__available -= 1
+        if self.__available == 0:
+            self.status = 'Borrowed'
         return True
 
     def return_book(self):
-        if self.status == 'Available':
+        """Puts one copy back on the shelf"""
+        if self.__available == self.copies:
             return False
+        self.__available += 1
         self.status = 'Available'
         return True
 
@@ -32,16 +72,603 @@ class Member:
     def __init__(self, name, unique_id):
         self.name = name
         self.id = unique_id
-        self.books_borrowed = {}  # Stores borrowed books mapped to their due dates
+        self.books_borrowed = {}  # Stores borrowed books (ISBN) mapped to their due dates (date objects)
 
     def __repr__(self):
         return f"Member: {self.name} ID: {self.id}"
 
 
+OverdueLoan = namedtuple('OverdueLoan', ['due_date', 'isbn', 'member_id', 'days_late', 'fine'])
+
+
+class Circulation:
+    """Every open loan, in a min-heap by due date so overdue sweeps only visit loans that are actually due."""
+    fine_per_day = 1  # Library charges $1 per day for each overdue book
+
+    def __init__(self):
+        self.__lock = threading.Lock()  # Loans of different books can be opened and closed from several threads
+        self.__heap = []  # Entries: (due date, sequence number, ISBN, member ID)
+        self.__live = {}  # Key: (ISBN, member ID), Value: sequence number of its heap entry. Others are stale.
+        self.__borrowers = {}  # Key: ISBN, Value: {member ID: due date}
+        self.__sequence = 0
+
+    def __len__(self):
+        return len(self.__live)
+
+    def check_out(self, isbn, member_id, due_date):
+        """Records a new loan"""
+        with self.__lock:
+            self.__sequence += 1
+            self.__live[(isbn, member_id)] = self.__sequence
+            self.__borrowers.setdefault(isbn, {})[member_id] = due_date
+            heapq.heappush(self.__heap, (due_date, self.__sequence, isbn, member_id))
+
+    def check_in(self, isbn, member_id):
+        """Closes a loan and returns its due date. Its heap entry is left behind and skipped from now on."""
+        with self.__lock:
+            del self.__live[(isbn, member_id)]
+            borrowers = self.__borrowers[isbn]
+            due_date = borrowers.pop(member_id)
+            if not borrowers:
+                del self.__borrowers[isbn]
+            if len(self.__heap) > 2 * len(self.__live) + 64:  # Mostly stale entries: rebuild from the open loans
+                self.__heap = [entry for entry in self.__heap if self.__live.get((entry[2], entry[3])) == entry[1]]
+                heapq.heapify(self.__heap)
+            return due_date
+
+    def borrowers(self, isbn):
+        """Returns {member ID: due date} of everyone currently holding a copy of this ISBN"""
+        with self.__lock:
+            return dict(self.__borrowers.get(isbn, {}))
+
+    def fine_for(self, due_date, return_date):
+        """Late fee for returning a book on return_date"""
+        return max(0, (return_date - due_date).days) * self.fine_per_day
+
+    def _due_by(self, last_date):
+        """Open loans due on or before last_date. Walks only the part of the heap with due dates up to last_date."""
+        with self.__lock:
+            heap, found, stack = self.__heap, [], [0] if self.__heap else []
+            while stack:
+                position = stack.pop()
+                entry = heap[position]
+                if entry[0] > last_date:  # Children of this entry are due even later
+                    continue
+                if self.__live.get((entry[2], entry[3])) == entry[1]:
+                    found.append(entry)
+                stack.extend(child for child in (2 * position + 1, 2 * position + 2) if child < len(heap))
+        found.sort()
+        return found
+
+    def overdue(self, as_of=None):
+        """OverdueLoan for every loan past its due date on as_of (default today), oldest first"""
+        as_of = as_of or date.today()
+        return [OverdueLoan(due_date, isbn, member_id, (as_of - due_date).days, self.fine_for(due_date, as_of))
+                for due_date, _, isbn, member_id in self._due_by(as_of - timedelta(days=1))]
+
+    def fines(self, as_of=None):
+        """Total fines owed so far per member ID"""
+        totals = {}
+        for loan in self.overdue(as_of):
+            totals[loan.member_id] = totals.get(loan.member_id, 0) + loan.fine
+        return totals
+
+    def reminders(self, as_of=None, days_ahead=3):
+        """(due date, ISBN, member ID) of loans not yet overdue but due within days_ahead days"""
+        as_of = as_of or date.today()
+        return [(due_date, isbn, member_id) for due_date, _, isbn, member_id in self._due_by(as_of + timedelta(days=days_ahead))
+                if due_date >= as_of]
+
+
+SearchResults = namedtuple('SearchResults', ['total', 'page', 'per_page', 'books'])
+
+
+class SearchIndex:
+    """Inverted index of title and author words, plus ISBN sets per category and per status.
+    Words of 3+ letters are also indexed by trigram so partial words can be found without scanning every book."""
+    fields = ('title', 'author')
+    exact_score, prefix_score, partial_score = 3, 2, 1  # Ranking weights for how well a word matched
+
+    def __init__(self):
+        self.__books = {}  # Key: ISBN, Value: Book object
+        self.__postings = {field: {} for field in self.fields}  # field -> word -> set of ISBNs
+        self.__trigrams = {field: {} for field in self.fields}  # field -> 3 letters -> set of words containing them
+        self.__categories = {}  # Key: category, Value: set of ISBNs
+        self.__statuses = {}  # Key: status, Value: set of ISBNs
+
+    def __len__(self):
+        return len(self.__books)
+
+    @staticmethod
+    def tokenize(text):
+        """Lower-case words of a text"""
+        return re.findall(r'\w+', text.lower())
+
+    @staticmethod
+    def _trigrams(word):
+        return {word[index:index + 3] for index in range(len(word) - 2)}
+
+    def add(self, book):
+        """Indexes a book and starts following its status changes"""
+        self.__books[book.isbn] = book
+        for field in self.fields:
+            postings = self.__postings[field]
+            for word in set(self.tokenize(getattr(book, field))):
+                if word not in postings:  # New word: make it findable by partial matches too
+                    postings[word] = set()
+                    for trigram in self._trigrams(word):
+                        self.__trigrams[field].setdefault(trigram, set()).add(word)
+                postings[word].add(book.isbn)
+        self.__categories.setdefault(book.category, set()).add(book.isbn)
+        self.__statuses.setdefault(book.status, set()).add(book.isbn)
+        book._index = self
+
+    def remove(self, book):
+        """Removes a book from the index"""
+        for field in self.fields:
+            postings = self.__postings[field]
+            for word in set(self.tokenize(getattr(book, field))):
+                postings[word].discard(book.isbn)
+                if not postings[word]:  # Last book with this word
+                    del postings[word]
+                    for trigram in self._trigrams(word):
+                        self.__trigrams[field][trigram].discard(word)
+        self.__categories[book.category].discard(book.isbn)
+        self.__statuses[book.status].discard(book.isbn)
+        del self.__books[book.isbn]
+        book._index = None
+
+    def update_status(self, book, old_status):
+        """Moves a book to the set of its new status (called by Book when its status changes)"""
+        self.__statuses[old_status].discard(book.isbn)
+        self.__statuses.setdefault(book.status, set()).add(book.isbn)
+
+    def _match_word(self, field, term):
+        """Returns {ISBN: score} of books with a word in this field that equals, starts with or contains term"""
+        postings = self.__postings[field]
+        if len(term) < 3:
+            words = [word for word in postings if term in word]  # Too short for trigrams: scan the words (not the books)
+        else:
+            trigram_sets = sorted((self.__trigrams[field].get(trigram, set()) for trigram in self._trigrams(term)), key=len)
+            words = set.intersection(*trigram_sets) if trigram_sets else set()
+        scores = {}
+        for word in words:
+            if word == term:
+                score = self.exact_score
+            elif word.startswith(term):
+                score = self.prefix_score
+            elif term in word:
+                score = self.partial_score
+            else:
+                continue
+            for isbn in postings[word]:
+                if scores.get(isbn, 0) < score:
+                    scores[isbn] = score
+        return scores
+
+    def search(self, title=None, author=None, category=None, available=None, page=1, per_page=10):
+        """Books matching every word given for title and author (whole or partial words), optionally filtered by
+        category and availability. Best matches come first. Returns a page of SearchResults."""
+        scores = None
+        for field, text in (('title', title), ('author', author)):
+            terms = self.tokenize(text or '')
+            if not terms and text and text.strip():  # Only punctuation: nothing can match it
+                return SearchResults(0, page, per_page, [])
+            for term in terms:
+                matches = self._match_word(field, term)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {isbn: score + matches[isbn] for isbn, score in scores.items() if isbn in matches}
+                if not scores:
+                    return SearchResults(0, page, per_page, [])
+
+        isbns = set(self.__books) if scores is None else set(scores)
+        if category is not None:
+            isbns &= self.__categories.get(category.upper(), set())
+        if available is not None:
+            isbns = isbns & self.__statuses.get('Available', set()) if available else isbns - self.__statuses.get('Available', set())
+
+        ranked = sorted(isbns, key=lambda isbn: (-(scores or {}).get(isbn, 0), self.__books[isbn].title.lower()))
+        first = (page - 1) * per_page
+        return SearchResults(len(ranked), page, per_page, [self.__books[isbn] for isbn in ranked[first:first + per_page]])
+
+
+class LibraryStore:
+    """On-disk catalogue made of:
+    - books.dat: compact book records, and books.idx: the ISBNs sorted with their record offsets. Both are read
+      through mmap, so opening is instant and a lookup (binary search) only touches the pages it needs.
+    - members.dat: members and their loans, loaded when the store opens.
+    - log.<n>: numbered append logs with every change since the last compaction.
+    compact() folds the logs into new .dat/.idx files. It runs in a background thread once the log grows past
+    compact_after bytes, while new changes go to a fresh log."""
+    __index_header = struct.Struct('<8sqQ')  # Magic, last log folded into this index, number of books
+    __index_entry = struct.Struct('<20sQ')  # ISBN (up to 20 bytes, zero padded), offset of its record in books.dat
+    __record_header = struct.Struct('<cI')  # Record type, payload length
+    __magic = b'LIBIDX01'
+    separator = '\x1f'  # Between the fields of a book record
+
+    def __init__(self, directory, compact_after=64 * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.compact_after = compact_after
+        self.__lock = threading.RLock()
+        self.__compaction = None  # Background compaction thread while one is running
+        self.__recent = {}  # Key: ISBN changed since the base files, Value: (log number, offset) or None if deleted
+        self.__members = {}  # Key: member ID, Value: (name, {ISBN: due date ordinal})
+        self.__readers = {}  # Key: log number, Value: file opened for reading records back
+        self._open_base()
+        self.__count = self.__base_count
+        for log_number in self._log_numbers():
+            if log_number <= self.__folded:  # Already part of the base files (crash right after a compaction)
+                os.remove(self._path(f'log.{log_number}'))
+            else:
+                self._replay(log_number)
+        self.__log_number = max([self.__folded, *self._log_numbers()]) + 1
+        self.__log = open(self._path(f'log.{self.__log_number}'), 'ab')
+        self.__readers[self.__log_number] = open(self._path(f'log.{self.__log_number}'), 'rb')
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _log_numbers(self):
+        return sorted(int(name[4:]) for name in os.listdir(self.directory) if name.startswith('log.') and name[4:].isdigit())
+
+    @staticmethod
+    def _map(path):
+        """Read-only mmap of a file (None if the file is missing or empty)"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, 'rb') as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _open_base(self):
+        self.__data = self._map(self._path('books.dat'))
+        self.__index = self._map(self._path('books.idx'))
+        self.__folded, self.__base_count = -1, 0
+        if self.__index is not None:
+            magic, self.__folded, self.__base_count = self.__index_header.unpack_from(self.__index, 0)
+            if magic != self.__magic:
+                raise ValueError(f'{self._path("books.idx")} is not a library index')
+        self.__members = {}
+        members = self._map(self._path('members.dat'))
+        if members is not None:
+            offset = 0
+            while offset < len(members):
+                _, length = self.__record_header.unpack_from(members, offset)
+                member_id, name, loans = json.loads(members[offset + 5:offset + 5 + length])
+                self.__members[member_id] = (name, loans)
+                offset += 5 + length
+            members.close()
+
+    def _base_offset(self, isbn):
+        """Offset of a book's record in books.dat, found by binary search over the mmapped index"""
+        if self.__index is None:
+            return None
+        key = isbn.encode().ljust(20, b'\0')
+        low, high = 0, self.__base_count
+        header, entry = self.__index_header.size, self.__index_entry.size
+        while low < high:
+            middle = (low + high) // 2
+            position = header + middle * entry
+            found = self.__index[position:position + 20]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                return self.__index_entry.unpack_from(self.__index, position)[1]
+        return None
+
+    @classmethod
+    def _read_record(cls, buffer, offset):
+        _, length = cls.__record_header.unpack_from(buffer, offset)
+        return bytes(buffer[offset + 5:offset + 5 + length])
+
+    def _replay(self, log_number):
+        """Loads the changes of a log and cuts off a torn record at its end"""
+        path = self._path(f'log.{log_number}')
+        with open(path, 'rb') as file:
+            data = file.read()
+        self.__readers[log_number] = open(path, 'rb')
+        offset = 0
+        while offset + 5 <= len(data):
+            kind, length = self.__record_header.unpack_from(data, offset)
+            if offset + 5 + length > len(data):
+                break
+            self._apply(kind, data[offset + 5:offset + 5 + length], log_number, offset)
+            offset += 5 + length
+        if offset < len(data):
+            with open(path, 'r+b') as file:
+                file.truncate(offset)
+
+    def _apply(self, kind, payload, log_number, offset):
+        if kind in (b'B', b'D'):
+            isbn = payload.decode() if kind == b'D' else payload.split(self.separator.encode(), 1)[0].decode()
+            existed = self.has_book(isbn)
+            self.__recent[isbn] = (log_number, offset) if kind == b'B' else None
+            self.__count += (kind == b'B') - existed
+        elif kind == b'M':
+            member_id, name, loans = json.loads(payload)
+            self.__members[member_id] = (name, loans)
+        elif kind == b'X':
+            self.__members.pop(payload.decode(), None)
+
+    def _write(self, kind, payload):
+        with self.__lock:
+            offset = self.__log.tell()
+            self.__log.write(self.__record_header.pack(kind, len(payload)) + payload)
+            self.__log.flush()
+            self._apply(kind, payload, self.__log_number, offset)
+            if offset > self.compact_after and self.__compaction is None:
+                self.start_compaction()
+
+    def has_book(self, isbn):
+        with self.__lock:
+            if isbn in self.__recent:
+                return self.__recent[isbn] is not None
+            return self._base_offset(isbn) is not None
+
+    def read_book(self, isbn):
+        """Returns (ISBN, title, author, category, copies) of a stored book, or None"""
+        with self.__lock:
+            if isbn in self.__recent:
+                location = self.__recent[isbn]
+                if location is None:
+                    return None
+                reader = self.__readers[location[0]]
+                reader.seek(location[1])
+                _, length = self.__record_header.unpack(reader.read(5))
+                payload = reader.read(length)
+            else:
+                offset = self._base_offset(isbn)
+                if offset is None:
+                    return None
+                payload = self._read_record(self.__data, offset)
+        isbn, title, author, category, copies = payload.decode().split(self.separator)
+        return isbn, title, author, category, int(copies)
+
+    def isbns(self):
+        """Every stored ISBN: the base index in sorted order, then books added since"""
+        with self.__lock:
+            recent = dict(self.__recent)
+            header, entry = self.__index_header.size, self.__index_entry.size
+            base = [self.__index[header + number * entry:header + number * entry + 20].rstrip(b'\0').decode()
+                    for number in range(self.__base_count)]
+        for isbn in base:
+            if isbn not in recent:
+                yield isbn
+        for isbn, location in recent.items():
+            if location is not None:
+                yield isbn
+
+    def book_count(self):
+        return self.__count
+
+    def put_book(self, book):
+        if len(book.isbn.encode()) > 20:
+            raise ValueError('ISBN can be at most 20 characters long.')
+        fields = (book.isbn, book.title, book.author, book.category, str(book.copies))
+        self._write(b'B', self.separator.join(fields).encode())
+
+    def delete_book(self, isbn):
+        self._write(b'D', isbn.encode())
+
+    def members(self):
+        """Returns {member ID: (name, {ISBN: due date ordinal})}"""
+        with self.__lock:
+            return dict(self.__members)
+
+    def put_member(self, member):
+        with self.__lock:  # Built and logged together, so a newer snapshot of the member is never logged first
+            loans = {isbn: due_date.toordinal() for isbn, due_date in member.books_borrowed.items()}
+            self._write(b'M', json.dumps([member.id, member.name, loans]).encode())
+
+    def delete_member(self, member_id):
+        self._write(b'X', member_id.encode())
+
+    def flush(self):
+        """Forces logged changes to disk"""
+        with self.__lock:
+            self.__log.flush()
+            os.fsync(self.__log.fileno())
+
+    def start_compaction(self):
+        """Runs compact() in a background thread"""
+        with self.__lock:
+            if self.__compaction is None:
+                self.__compaction = threading.Thread(target=self.compact, daemon=True)
+                self.__compaction.start()
+            return self.__compaction
+
+    def compact(self):
+        """Writes the current catalogue into new books.dat/books.idx/members.dat and removes the folded logs.
+        Changes made meanwhile go to a new log, which the new base files do not include."""
+        with self.__lock:
+            self.flush()
+            folded = self.__log_number
+            self.__log.close()
+            self.__log_number += 1
+            self.__log = open(self._path(f'log.{self.__log_number}'), 'ab')
+            self.__readers[self.__log_number] = open(self._path(f'log.{self.__log_number}'), 'rb')
+            isbns = sorted(self.isbns())
+            members = self.members()
+
+        entries = []
+        with open(self._path('books.dat.tmp'), 'wb') as data:
+            for isbn in isbns:
+                book = self.read_book(isbn)
+                if book is None:  # Deleted while compacting
+                    continue
+                payload = self.separator.join(map(str, book)).encode()
+                entries.append(self.__index_entry.pack(isbn.encode().ljust(20, b'\0'), data.tell()))
+                data.write(self.__record_header.pack(b'B', len(payload)) + payload)
+            data.flush()
+            os.fsync(data.fileno())
+        with open(self._path('books.idx.tmp'), 'wb') as index:
+            index.write(self.__index_header.pack(self.__magic, folded, len(entries)))
+            index.writelines(entries)
+            index.flush()
+            os.fsync(index.fileno())
+        with open(self._path('members.dat.tmp'), 'wb') as file:
+            for member_id, (name, loans) in members.items():
+                payload = json.dumps([member_id, name, loans]).encode()
+                file.write(self.__record_header.pack(b'M', len(payload)) + payload)
+            file.flush()
+            os.fsync(file.fileno())
+
+        with self.__lock:
+            for mapped in (self.__data, self.__index):  # Closed first: Windows cannot replace a file that is mapped
+                if mapped is not None:
+                    mapped.close()
+            for name in ('books.dat', 'members.dat', 'books.idx'):  # The index last: it says which logs are folded
+                os.replace(self._path(name + '.tmp'), self._path(name))
+            newer = {isbn: location for isbn, location in self.__recent.items()
+                     if location is None or location[0] > folded}
+            newer_members = self.__members
+            self._open_base()
+            self.__members.update({member_id: state for member_id, state in newer_members.items()})
+            for member_id in set(self.__members) - set(newer_members):  # Deleted while compacting
+                del self.__members[member_id]
+            self.__recent = {isbn: location for isbn, location in newer.items()
+                             if location is not None or self._base_offset(isbn) is not None}
+            for log_number in [number for number in self.__readers if number <= folded]:
+                self.__readers.pop(log_number).close()
+                os.remove(self._path(f'log.{log_number}'))
+            self.__compaction = None
+
+    def close(self):
+        if self.__compaction is not None:
+            self.__compaction.join()
+        with self.__lock:
+            self.flush()
+            self.__log.close()
+            for reader in self.__readers.values():
+                reader.close()
+            for mapped in (self.__data, self.__index):
+                if mapped is not None:
+                    mapped.close()
+
+
+class StoredBooks(MutableMapping):
+    """Library.books backed by a LibraryStore. A book is read from disk the first time it is used."""
+
+    def __init__(self, store, circulation):
+        self.__store = store
+        self.__circulation = circulation  # Open loans decide how many copies of a book are on the shelf
+        self.__cache = {}  # Key: ISBN, Value: Book objects already read
+        self.__lock = threading.Lock()  # Threads missing the cache together must still share one Book
+
+    def __getitem__(self, isbn):
+        book = self.__cache.get(isbn)
+        if book is None:
+            with self.__lock:
+                book = self.__cache.get(isbn)  # Another thread may have read it while this one waited
+                if book is None:
+                    fields = self.__store.read_book(isbn)
+                    if fields is None:
+                        raise KeyError(isbn)
+                    book = Book(fields[1], fields[2], fields[0], fields[3], fields[4])
+                    for _ in self.__circulation.borrowers(isbn):
+                        book.borrow_book()
+                    self.__cache[isbn] = book
+        return book
+
+    def __contains__(self, isbn):
+        return isbn in self.__cache or self.__store.has_book(isbn)
+
+    def __setitem__(self, isbn, book):
+        with self.__lock:
+            self.__store.put_book(book)
+            self.__cache[isbn] = book
+
+    def __delitem__(self, isbn):
+        if isbn not in self:
+            raise KeyError(isbn)
+        with self.__lock:
+            self.__store.delete_book(isbn)
+            self.__cache.pop(isbn, None)
+
+    def __iter__(self):
+        return self.__store.isbns()
+
+    def __len__(self):
+        return self.__store.book_count()
+
+
+class StoredMembers(dict):
+    """Library.members that also writes every registered or removed member to a LibraryStore"""
+
+    def __init__(self, store, members=()):
+        super().__init__(members)
+        self.__store = store
+
+    def __setitem__(self, member_id, member):
+        self.__store.put_member(member)
+        super().__setitem__(member_id, member)
+
+    def __delitem__(self, member_id):
+        self.__store.delete_member(member_id)
+        super().__delitem__(member_id)
+
+    def update(self, members=(), **more):
+        for member_id, member in dict(members, **more).items():
+            self[member_id] = member
+
+
+ImportReport = namedtuple('ImportReport', ['imported', 'rejected'])  # rejected: list of (line number, ISBN or ID, reason)
+CirculationResult = namedtuple('CirculationResult', ['ok', 'message', 'due_date', 'fine'])
+
+
 class Library:
     def __init__(self):
         self.books = {}  # Dictionary to store books by ISBN
         self.members = {}  # key: member.id, value: Member object
+        self.__index = SearchIndex()  # Updated by add_book and by status changes of the books
+        self.__unindexed = []  # Groups of bulk imported (or stored) books, indexed the next time the index is used
+        self.store = None  # LibraryStore when opened with Library.open()
+        self.circulation = Circulation()  # Open loans by due date
+        self.__locks = [threading.Lock() for _ in range(64)]  # Borrowing/returning a book holds the lock of its ISBN
+        self.__member_locks = [threading.Lock() for _ in range(64)]  # Taken after the ISBN lock to change member loans
+        self.__reservations = {}  # Key: ISBN, Value: deque of member IDs waiting for a copy
+        self.__holds = {}  # Key: ISBN, Value: {member ID: None} of members with a returned copy set aside for them
+
+    @property
+    def index(self):
+        """Search index of the catalogue (brings it up to date with bulk imports first)"""
+        if self.__unindexed:
+            for books in self.__unindexed:
+                for book in books:
+                    self.__index.add(book)
+            self.__unindexed = []
+        return self.__index
+
+    @classmethod
+    def open(cls, directory):
+        """Opens a Library kept on disk in a directory (created if missing). Books are read when first used and
+        every change is written to the store's log."""
+        library = cls()
+        library.store = LibraryStore(directory)
+        for member_id, (name, loans) in library.store.members().items():
+            member = Member(name, member_id)
+            for isbn, due_ordinal in loans.items():
+                member.books_borrowed[isbn] = date.fromordinal(due_ordinal)
+                library.circulation.check_out(isbn, member_id, member.books_borrowed[isbn])
+            dict.__setitem__(library.members, member_id, member)
+        library.members = StoredMembers(library.store, library.members)
+        library.books = StoredBooks(library.store, library.circulation)
+        library.__unindexed = [library.books.values()]  # The search index is only built if a search needs it
+        return library
+
+    def close(self):
+        """Closes the on-disk store (if any)"""
+        if self.store is not None:
+            self.store.close()
+
+    def _member_changed(self, member):
+        """Writes a member whose loans changed to the store (if any)"""
+        if self.store is not None:
+            self.store.put_member(member)
 
     def add_book(self, book):
         """Adds a book if not found in the Library"""
@@ -51,12 +678,20 @@ class Library:
         if not book.title or not book.author or not book.isbn:
             print("Invalid book details. Title, author, and ISBN cannot be empty.")
             return
-        if book.category not in ['FICTION', 'NON-FICTION']:
+        if book.category not in CATEGORIES:
             print('Invalid book category. It has to be eiter "FICTION" or "NON-FICTION".')
             return
         self.books[book.isbn] = book
+        if self.__unindexed:  # Index not built yet: queue the book rather than building it now
+            self.__unindexed.append([book])
+        else:
+            self.__index.add(book)
         print(f'Book "{book.title}" added successfully to the Library.')
 
+    def find(self, title=None, author=None, category=None, available=None, page=1, per_page=10):
+        """Programmatic search (no prompts or prints), see SearchIndex.search"""
+        return self.index.search(title, author, category, available, page, per_page)
+
     def register_member(self, member):
         """Registers a new member if the ID is unique."""
         if member.id in self.members:
@@ -68,6 +703,209 @@ class Library:
         self.members[member.id] = member
         print(f'Member "{member.name}" registered successfully.')
 
+    @staticmethod
+    def _read_records(file, fmt, fields):
+        """Streams (line number, [values of fields]) from a CSV file with a header row or a JSON Lines file.
+        Values are None for a line that is not valid JSON or not a JSON object."""
+        if fmt == 'csv':
+            reader = csv.reader(file)
+            header = [name.strip().lower() for name in next(reader, [])]
+            missing = [field for field in fields if field not in header]
+            if missing:
+                raise ValueError(f'CSV header is missing the column(s): {", ".join(missing)}')
+            positions = [header.index(field) for field in fields]
+            for line_number, row in enumerate(reader, start=2):
+                if row:
+                    yield line_number, [row[position].strip() if position < len(row) else '' for position in positions]
+        elif fmt == 'jsonl':
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    yield line_number, None
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, None
+                    continue
+                yield line_number, [str(record.get(field) or '').strip() for field in fields]
+        else:
+            raise ValueError('File format must be "csv" or "jsonl"')
+
+    def import_books(self, file, fmt='csv', chunk_size=10_000):
+        """Bulk loads books (title, author, isbn, category) from a CSV or JSON Lines file object, chunk by chunk,
+        without printing per book. Returns an ImportReport of how many were added and which lines were rejected."""
+        imported, rejected = 0, []
+        records = self._read_records(file, fmt, ('title', 'author', 'isbn', 'category'))
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            accepted = {}
+            for line_number, values in chunk:
+                if values is None:
+                    rejected.append((line_number, None, 'Invalid record'))
+                    continue
+                title, author, isbn, category = values
+                if not title or not author or not isbn:
+                    rejected.append((line_number, isbn, 'Title, author and ISBN cannot be empty'))
+                elif category.upper() not in CATEGORIES:
+                    rejected.append((line_number, isbn, f'Invalid category: {category}'))
+                elif isbn in self.books or isbn in accepted:
+                    rejected.append((line_number, isbn, 'Duplicate ISBN'))
+                else:
+                    accepted[isbn] = (line_number, Book(title, author, isbn, category))
+            added = []
+            for isbn, (line_number, book) in accepted.items():
+                try:
+                    self.books[isbn] = book
+                except ValueError as error:  # Refused by the store (e.g. an ISBN longer than 20 bytes)
+                    rejected.append((line_number, isbn, str(error)))
+                    continue
+                added.append(book)
+            self.__unindexed.append(added)
+            imported += len(added)
+        return ImportReport(imported, rejected)
+
+    def import_members(self, file, fmt='csv', chunk_size=10_000):
+        """Bulk registers members (name, id) from a CSV or JSON Lines file object. Returns an ImportReport."""
+        imported, rejected = 0, []
+        records = self._read_records(file, fmt, ('name', 'id'))
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            accepted = {}
+            for line_number, values in chunk:
+                if values is None:
+                    rejected.append((line_number, None, 'Invalid record'))
+                    continue
+                name, member_id = values
+                if not name or not member_id:
+                    rejected.append((line_number, member_id, 'Name and ID cannot be empty'))
+                elif member_id in self.members or member_id in accepted:
+                    rejected.append((line_number, member_id, 'Duplicate member ID'))
+                else:
+                    accepted[member_id] = Member(name, member_id)
+            self.members.update(accepted)
+            imported += len(accepted)
+        return ImportReport(imported, rejected)
+
+    def export_books(self, file, fmt='csv'):
+        """Streams the catalogue to a CSV or JSON Lines file object in a format import_books can read back.
+        Returns the number of books written."""
+        rows = ((book.title, book.author, book.isbn, book.category) for book in self.books.values())
+        if fmt == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(('title', 'author', 'isbn', 'category'))
+            writer.writerows(rows)
+        elif fmt == 'jsonl':
+            file.writelines(json.dumps({'title': title, 'author': author, 'isbn': isbn, 'category': category}) + '\n'
+                            for title, author, isbn, category in rows)
+        else:
+            raise ValueError('File format must be "csv" or "jsonl"')
+        return len(self.books)
+
+    def export_members(self, file, fmt='csv'):
+        """Streams the members to a CSV or JSON Lines file object. Returns the number of members written."""
+        if fmt == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(('name', 'id'))
+            writer.writerows((member.name, member.id) for member in self.members.values())
+        elif fmt == 'jsonl':
+            file.writelines(json.dumps({'name': member.name, 'id': member.id}) + '\n' for member in self.members.values())
+        else:
+            raise ValueError('File format must be "csv" or "jsonl"')
+        return len(self.members)
+
+    def _lock_for(self, isbn):
+        return self.__locks[hash(isbn) % len(self.__locks)]
+
+    def _member_lock_for(self, member_id):
+        return self.__member_locks[hash(member_id) % len(self.__member_locks)]
+
+    def checkout(self, isbn, member_id):
+        """Lends a copy to a member (no prompts or prints, safe to call from several threads).
+        Members with a copy held for their reservation get that copy."""
+        book, member = self.books.get(isbn), self.members.get(member_id)
+        if book is None:
+            return CirculationResult(False, 'The book is not currently present in the Library', None, 0)
+        if member is None:
+            return CirculationResult(False, 'Not a member in the Library', None, 0)
+        with self._lock_for(isbn):
+            if isbn in member.books_borrowed:
+                return CirculationResult(False, f'{member.name} already has a copy of this book', None, 0)
+            holds = self.__holds.get(isbn)
+            if holds and member_id in holds:  # The copy set aside for this member is already off the shelf
+                del holds[member_id]
+            elif not book.borrow_book():
+                return CirculationResult(False, 'No copies available. The book can be reserved.', None, 0)
+            due_date = self._get_due_date()
+            with self._member_lock_for(member_id):  # The member may be borrowing another book in another thread
+                member.books_borrowed[isbn] = due_date
+                self.circulation.check_out(isbn, member_id, due_date)
+                self._member_changed(member)
+        return CirculationResult(True, f'"{book.title}" has been borrowed by {member.name}.', due_date, 0)
+
+    def checkin(self, isbn, member_id, return_date=None):
+        """Takes back a copy and works out the late fee (no prompts or prints, safe to call from several threads).
+        If members are waiting for this book, the copy is set aside for the first of them."""
+        book, member = self.books.get(isbn), self.members.get(member_id)
+        if book is None:
+            return CirculationResult(False, 'Book Not Found! This book does not belong in this Library.', None, 0)
+        if member is None:
+            return CirculationResult(False, 'Member not found! Not a member in the Library', None, 0)
+        return_date = return_date or date.today()
+        with self._lock_for(isbn):
+            with self._member_lock_for(member_id):
+                due_date = member.books_borrowed.pop(isbn, None)
+                if due_date is None:
+                    return CirculationResult(False, f"The book was not found in the {member.name}'s borrowed list!!!", None, 0)
+                self.circulation.check_in(isbn, member_id)
+                self._member_changed(member)
+            message = f'"{book.title}" has been returned by {member.name}.'
+            waiting = self.__reservations.get(isbn)
+            if waiting:
+                next_member_id = waiting.popleft()
+                self.__holds.setdefault(isbn, {})[next_member_id] = None  # The copy stays off the shelf for them
+                message += f' A copy is now held for {self.members[next_member_id].name}.'
+            else:
+                book.return_book()
+        return CirculationResult(True, message, due_date, self.circulation.fine_for(due_date, return_date))
+
+    def reserve(self, isbn, member_id):
+        """Puts a member in the queue for a book with no copies on the shelf"""
+        book, member = self.books.get(isbn), self.members.get(member_id)
+        if book is None or member is None:
+            return CirculationResult(False, 'Unknown book or member', None, 0)
+        with self._lock_for(isbn):
+            waiting = self.__reservations.setdefault(isbn, deque())
+            if book.available_copies > 0 and not waiting:
+                return CirculationResult(False, 'A copy is available, borrow it instead.', None, 0)
+            if isbn in member.books_borrowed or member_id in waiting or member_id in self.__holds.get(isbn, {}):
+                return CirculationResult(False, f'{member.name} already has, holds or reserved this book', None, 0)
+            waiting.append(member_id)
+            return CirculationResult(True, f'{member.name} is number {len(waiting)} in the queue for "{book.title}".', None, 0)
+
+    def cancel_reservation(self, isbn, member_id):
+        """Removes a member from the queue of a book, or releases the copy held for them"""
+        book = self.books[isbn]
+        with self._lock_for(isbn):
+            if member_id in self.__reservations.get(isbn, ()):
+                self.__reservations[isbn].remove(member_id)
+                return True
+            holds = self.__holds.get(isbn, {})
+            if member_id in holds:
+                del holds[member_id]
+                waiting = self.__reservations.get(isbn)
+                if waiting:  # Pass the held copy on to the next member in the queue
+                    holds[waiting.popleft()] = None
+                else:
+                    book.return_book()
+                return True
+            return False
+
     def borrowing_book(self, book, member):
         """Allows a member to borrow a book if available and sets a due date"""
         if book.isbn not in self.books:
@@ -78,14 +916,12 @@ class Library:
             print(f'{member.name} is not a member in the Library')
             return
 
-        if not book.borrow_book():
-            print('The book is already borrowed')
+        result = self.checkout(book.isbn, member.id)
+        if not result.ok:
+            print(result.message)
             return
-
-        member.books_borrowed[book.isbn] = self._get_due_date()
-        book.borrow_book()
-        print(f'"{book.title}" has been borrowed by {member.name}.')
-        print(f'Due Date: {member.books_borrowed[book.isbn]}')
+        print(result.message)
+        print(f'Due Date: {result.due_date}')
 
     def returning_book(self, book, member):
         """Allows a member to return a borrowed book"""
@@ -97,29 +933,18 @@ class Library:
             print(f'Member not found! {member.name} is not a member in the Library')
             return
 
-        if book.isbn not in member.books_borrowed:
-            print(f"The book was not found in the {member.name}'s borrowed list!!!")
+        result = self.checkin(book.isbn, member.id)
+        if not result.ok:
+            print(result.message)
             return
-
-        due_date_str = member.books_borrowed[book.isbn]
-        return_date_str = datetime.today().strftime('%Y-%m-%d')
-
-        if return_date_str <= due_date_str:
-            del member.books_borrowed[book.isbn]
-            book.return_book()
-            print(f'"{book.title}" has been returned by {member.name}.')
-        else:
-            delayed_num_of_days = (datetime.strptime(return_date_str, "%Y-%m-%d") - datetime.strptime(due_date_str, "%Y-%m-%d")).days
-            late_fee = delayed_num_of_days * 1
-            print(f'You were late by {delayed_num_of_days} day(s).')
-            print(f'Late Fee: ${late_fee} (Library charges $1 per day for each overdue book.)')
-            del member.books_borrowed[book.isbn]
-            book.status = 'Available'
-            print(f'"{book.title}" has been returned by {member.name}.')
+        if result.fine:
+            print(f'You were late by {(date.today() - result.due_date).days} day(s).')
+            print(f'Late Fee: ${result.fine} (Library charges $1 per day for each overdue book.)')
+        print(result.message)
 
     def display_available_books(self):
         """Displays books that are available for borrowing."""
-        available_books = [book for book in self.books.values() if book.status == 'Available']
+        available_books = self.find(available=True, per_page=len(self.books)).books
         if not available_books:
             print("No books are currently available in the Library")
             return
@@ -127,6 +952,18 @@ class Library:
         for index, book in enumerate(available_books, start=1):
             print(f'{index}. {book.title}')
 
+    def display_overdue_books(self, as_of=None):
+        """Displays every overdue loan with the fine owed so far"""
+        overdue = self.circulation.overdue(as_of)
+        if not overdue:
+            print('No books are overdue.')
+            return
+        print('\n-----Overdue Books------')
+        for index, loan in enumerate(overdue, start=1):
+            member = self.members[loan.member_id]
+            print(f'{index}. {self.books[loan.isbn].title} - {member.name} - Due: {loan.due_date} '
+                  f'- Late by {loan.days_late} day(s) - Fine: ${loan.fine}')
+
     def borrowed_books_by_member(self, member):
         """Displays books borrowed by a specific member."""
         if member.id not in self.members:
@@ -153,7 +990,7 @@ class Library:
             choice = input('Choose an option (1-5): ').strip()
             if choice == '1':
                 title = input('Please enter the name of the book you are looking for: ').strip().lower()
-                search_book = [book for book in self.books.values() if title in book.title.lower()]
+                search_book = self.find(title=title, per_page=len(self.books)).books
                 if search_book:
                     print(f'----Similar matches found with the Title: {title}')
                     for index, books in enumerate(search_book, start=1):
@@ -168,7 +1005,7 @@ class Library:
                     return
             elif choice == '2':
                 author = input('Please enter the name of the author: ').strip().lower()
-                search_author = [book for book in self.books.values() if author in book.author.lower()]
+                search_author = self.find(author=author, per_page=len(self.books)).books
                 if search_author:
                     print(f'Books written by {author}')
                     for index, books in enumerate(search_author, start=1):
@@ -193,10 +1030,10 @@ class Library:
                 while True:
                     category = input('Please choose an option (1 or 2): ').strip()
                     if category == '1':
-                        books_by_category = [b for b in self.books.values() if b.category == 'FICTION']
+                        books_by_category = self.find(category='FICTION', per_page=len(self.books)).books
                         break
                     elif category == '2':
-                        books_by_category = [b for b in self.books.values() if b.category == 'NON-FICTION']
+                        books_by_category = self.find(category='NON-FICTION', per_page=len(self.books)).books
                         break
                     else:
                         print('Please enter a valid option. Either "1" or "2"')
@@ -223,14 +1060,12 @@ class Library:
     @staticmethod
     def _get_due_date():
         """Returns the due date (21 days from the current date)"""
-        borrow_date_str = datetime.today().strftime('%Y-%m-%d')
-        borrow_date = datetime.strptime(borrow_date_str, "%Y-%m-%d")
-        due_date = str((borrow_date + timedelta(days=21)).date())
-        return due_date
+        return date.today() + timedelta(days=21)
 
 
 # ----- Create Library Instance -----
 my_library = Library()
+# my_library = Library.open('library_data')  # Keeps books and members on disk between runs
 
 # ----- Test Books -----
 book1 = Book("The Alchemist", "Paulo Coelho", "1234567890", "Fiction")
@@ -284,7 +1119,7 @@ my_library.register_member(member2)  # ✅ Should succeed
 # 🔁 Borrow again, simulate late return
 # Manually set a past due date to simulate late return
 # my_library.borrowing_book(book1, member1)
-# member1.books_borrowed[book1.isbn] = "2024-12-01"  # Simulate overdue
+# member1.books_borrowed[book1.isbn] = date(2024, 12, 1)  # Simulate overdue
 
 # my_library.returning_book(book1, member1)  # Should show late fee
 
@@ -296,3 +1131,101 @@ my_library.borrowed_books_by_member(member3)  # Should fail (not registered)
 # my_library.search()
 
 
+def benchmark_import(count=200_000):
+    """Times bulk import, export and the deferred search index build for a generated catalogue"""
+    books = [(f'Book Title {number}', f'Author {number % 5000}', f'{number:013d}', 'Fiction' if number % 2 else 'Non-Fiction')
+             for number in range(count)]
+    for fmt in ('csv', 'jsonl'):
+        source = io.StringIO()
+        if fmt == 'csv':
+            writer = csv.writer(source)
+            writer.writerow(('title', 'author', 'isbn', 'category'))
+            writer.writerows(books)
+        else:
+            source.writelines(json.dumps(dict(zip(('title', 'author', 'isbn', 'category'), book))) + '\n' for book in books)
+        source.seek(0)
+        library = Library()
+
+        start = time.perf_counter()
+        report = library.import_books(source, fmt)
+        import_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        library.export_books(io.StringIO(), fmt)
+        export_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        library.index  # Builds the deferred search index
+        index_seconds = time.perf_counter() - start
+
+        print(f'{fmt:>5}: imported {report.imported:,} books at {report.imported / import_seconds:,.0f}/s, '
+              f'exported at {count / export_seconds:,.0f}/s, search index built in {index_seconds:.2f}s')
+
+
+# benchmark_import()
+
+
+def load_test_circulation(worker_counts=(1, 2, 4, 8), books=1_000, copies=3, members=2_000, operations=100_000):
+    """Runs random borrow/return pairs from a thread pool and checks that no copy was lost or lent twice"""
+    print(f'{"Workers":>8} {"Ops/s":>12} {"Borrowed":>10}')
+    for workers in worker_counts:
+        library = Library()
+        for number in range(books):
+            library.books[str(number)] = Book(f'Title {number}', 'Author', str(number), 'Fiction', copies)
+        for number in range(members):
+            library.members[str(number)] = Member(f'Member {number}', str(number))
+        borrowed = [0] * workers
+
+        def run(worker):
+            rng = random.Random(worker)
+            for _ in range(operations // workers):
+                isbn, member_id = str(rng.randrange(books)), str(rng.randrange(members))
+                if library.checkout(isbn, member_id).ok:
+                    borrowed[worker] += 1
+                    library.checkin(isbn, member_id)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, range(workers)))
+        seconds = time.perf_counter() - start
+
+        # Every copy must be back on the shelf and no loan may be left open
+        assert all(book.available_copies == copies for book in library.books.values())
+        assert len(library.circulation) == 0
+        print(f'{workers:>8} {2 * sum(borrowed) / seconds:>12,.0f} {sum(borrowed):>10,}')
+
+
+# load_test_circulation()
+
+
+def benchmark_store(count=1_000_000, directory='library_benchmark'):
+    """Builds an on-disk catalogue, then times opening it and looking up random books"""
+    if not os.path.exists(os.path.join(directory, 'books.idx')):
+        library = Library.open(directory)
+        source = io.StringIO()
+        writer = csv.writer(source)
+        writer.writerow(('title', 'author', 'isbn', 'category'))
+        writer.writerows((f'Book Title {number}', f'Author {number % 5000}', f'{number:013d}', 'Fiction')
+                         for number in range(count))
+        source.seek(0)
+        library.import_books(source)
+        library.store.compact()
+        library.close()
+
+    start = time.perf_counter()
+    library = Library.open(directory)
+    open_seconds = time.perf_counter() - start
+
+    isbns = [f'{random.randrange(count):013d}' for _ in range(10_000)]
+    start = time.perf_counter()
+    for isbn in isbns:
+        library.books[isbn]
+    lookup_seconds = time.perf_counter() - start
+    print(f'Opened {len(library.books):,} books in {open_seconds * 1000:.1f} ms, '
+          f'{len(isbns) / lookup_seconds:,.0f} cold lookups/s')
+    library.close()
+
+
+# benchmark_store()
+
+
@@ -1,24 +1,387 @@
 import json
-from datetime import datetime, date
+import os
+import shutil
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, date, timedelta
 
-# File where tasks will be stored
+# Tasks are stored as a snapshot of the whole list plus a journal with one line per change made since.
+# A change only appends to the journal, the snapshot is rewritten (atomically) once the journal gets long.
 TASK_FILE = "tasks.json"
+JOURNAL_FILE = "tasks.journal"
+COMPACT_AFTER = 1000  # Journal lines before they are folded into the snapshot (or half the number of tasks, if more)
 
-# Load existing tasks from file
+last_seq = 0  # Number of the last change applied to the list
+journal_lines = 0  # Changes in the journal that the snapshot does not have yet
+journal = None  # The journal, open for appending
+task_index = None  # TaskIndex over the tasks, built by load_tasks()
+reminders = None  # ReminderScheduler of the running app
+
+
+def back_up_corrupt(path, keep_original=False):
+    """Keeps a copy of a damaged file next to it instead of losing it"""
+    backup = f'{path}.corrupt-{datetime.now():%Y%m%d-%H%M%S}'
+    if keep_original:
+        shutil.copyfile(path, backup)
+    else:
+        os.replace(path, backup)
+    print(f'⚠️ {path} is damaged! A copy was kept as {backup}.')
+
+
+class TaskIndex:
+    """In-memory indexes over the tasks, so lookups and due-date questions never scan the whole list"""
+
+    def __init__(self):
+        self.by_name = {}  # Key: task name, Value: set of IDs
+        self.by_word = {}  # Key: one word of a task name, Value: set of IDs
+        self.completed = bytearray()  # Status bitmap: bit ID is set while the task is completed
+        self.completed_count = 0
+        self.due_days = []  # Sorted ordinals of the days pending tasks are due on
+        self.due_on_day = {}  # Key: day ordinal, Value: set of IDs of the pending tasks due that day
+        self.due_dates = {}  # Key: ID, Value: due date (parsed once)
+        self.next_id = 1
+
+    def is_completed(self, task_id):
+        byte = task_id >> 3
+        return byte < len(self.completed) and bool(self.completed[byte] >> (task_id & 7) & 1)
+
+    def _set_completed(self, task_id, completed):
+        byte, bit = task_id >> 3, 1 << (task_id & 7)
+        if byte >= len(self.completed):
+            self.completed.extend(bytes(byte + 1 - len(self.completed)))
+        if completed:
+            self.completed[byte] |= bit
+        else:
+            self.completed[byte] &= ~bit
+
+    def add(self, task):
+        task_id = task['ID']
+        self.next_id = max(self.next_id, task_id + 1)
+        self.by_name.setdefault(task['Task name'], set()).add(task_id)
+        for word in set(task['Task name'].split()):
+            self.by_word.setdefault(word, set()).add(task_id)
+        if 'Due Date' in task:
+            try:
+                self.due_dates[task_id] = date.fromisoformat(task['Due Date'])
+            except ValueError:
+                pass
+        if task['Status'] == 'Completed':
+            self._set_completed(task_id, True)
+            self.completed_count += 1
+        elif task_id in self.due_dates:
+            day = self.due_dates[task_id].toordinal()
+            if day not in self.due_on_day:
+                self.due_on_day[day] = set()
+                insort(self.due_days, day)  # Only for a new day, and there are far fewer days than tasks
+            self.due_on_day[day].add(task_id)
+
+    def remove(self, task):
+        task_id = task['ID']
+        keys = [(self.by_name, task['Task name'])] + [(self.by_word, word) for word in set(task['Task name'].split())]
+        for index, key in keys:
+            index[key].discard(task_id)
+            if not index[key]:
+                del index[key]
+        if self.is_completed(task_id):
+            self._set_completed(task_id, False)
+            self.completed_count -= 1
+        else:
+            self._remove_due(task_id)
+        self.due_dates.pop(task_id, None)
+
+    def complete(self, task):
+        if not self.is_completed(task['ID']):
+            self._set_completed(task['ID'], True)
+            self.completed_count += 1
+            self._remove_due(task['ID'])
+
+    def _remove_due(self, task_id):
+        if task_id in self.due_dates:
+            day = self.due_dates[task_id].toordinal()
+            self.due_on_day[day].discard(task_id)
+            if not self.due_on_day[day]:
+                del self.due_on_day[day]
+                del self.due_days[bisect_left(self.due_days, day)]
+
+    def completed_ids(self):
+        """IDs of the completed tasks, read from the status bitmap"""
+        return [byte * 8 + bit for byte, bits in enumerate(self.completed) if bits
+                for bit in range(8) if bits >> bit & 1]
+
+    def overdue(self, today):
+        """IDs of pending tasks due before today, earliest first"""
+        days = self.due_days[:bisect_left(self.due_days, today.toordinal())]
+        return [task_id for day in days for task_id in sorted(self.due_on_day[day])]
+
+    def due_on(self, day):
+        """IDs of pending tasks due on a day"""
+        return sorted(self.due_on_day.get(day.toordinal(), ()))
+
+    def count_overdue(self, today):
+        days = self.due_days[:bisect_left(self.due_days, today.toordinal())]
+        return sum(len(self.due_on_day[day]) for day in days)
+
+    def find(self, name):
+        """IDs of the tasks with exactly this name, else of the tasks whose names have every word of it"""
+        name = ' '.join(name.lower().split())
+        if name in self.by_name:
+            return sorted(self.by_name[name])
+        words = [self.by_word.get(word, set()) for word in name.split()]
+        return sorted(set.intersection(*words)) if words else []
+
+
+def apply_change(tasks, index, change):
+    """Applies one journal record to the tasks and their index (used for new changes and when replaying the journal).
+    Records written before tasks had IDs point at tasks by their place in the list."""
+    if change['op'] == 'add':
+        task = change['task']
+        task.setdefault('ID', index.next_id)
+        tasks[task['ID']] = task
+        index.add(task)
+    elif change['op'] == 'complete':
+        task = tasks[change['id']] if 'id' in change else list(tasks.values())[change['index']]
+        task['Status'] = 'Completed'
+        index.complete(task)
+    elif change['op'] == 'delete':
+        ids = change['ids'] if 'ids' in change else [list(tasks)[place] for place in change['indexes']]
+        for task_id in ids:
+            index.remove(tasks.pop(task_id))
+    elif change['op'] == 'remove_completed':
+        for task_id in index.completed_ids():
+            index.remove(tasks.pop(task_id))
+    else:
+        raise ValueError(f'Unknown change: {change["op"]}')
+
+
+class TimerWheel:
+    """Hierarchical timer wheel. A timer sits in a slot of the wheel that matches how far away it is and moves
+    down to finer wheels as its time gets near, so scheduling and cancelling are O(1) and advancing the clock
+    only looks at the slots that come due, never at every timer."""
+
+    def __init__(self, tick, start, slots=64, levels=4):
+        self.tick = tick  # Seconds per slot of the finest wheel
+        self.slots = slots
+        self.levels = levels  # The coarsest wheel covers slots ** levels ticks, later timers wait in an overflow
+        self.__spans = [slots ** level for level in range(levels + 1)]  # Ticks per slot of each wheel
+        self.__now = int(start // tick)  # Current tick, every timer up to it has fired
+        self.__wheels = [[{} for _ in range(slots)] for _ in range(levels)]  # Slot: {key: (tick, payload)}
+        self.__overflow = {}
+        self.__due = {}  # Timers scheduled at or before the current tick, fired by the next advance()
+        self.__where = {}  # Key: timer key, Value: the slot it is in
+
+    def __len__(self):
+        return len(self.__where)
+
+    def __contains__(self, key):
+        return key in self.__where
+
+    def schedule(self, key, when, payload=None):
+        """Sets (or moves) the timer called key to fire at time when"""
+        self.cancel(key)
+        self._place(key, int(when // self.tick), payload)
+
+    def cancel(self, key):
+        slot = self.__where.pop(key, None)
+        if slot is not None:
+            del slot[key]
+
+    def _place(self, key, at, payload):
+        distance = at - self.__now
+        if distance <= 0:
+            slot = self.__due
+        else:
+            for level in range(self.levels):
+                if distance < self.__spans[level + 1]:
+                    slot = self.__wheels[level][at // self.__spans[level] % self.slots]
+                    break
+            else:
+                slot = self.__overflow
+        slot[key] = (at, payload)
+        self.__where[key] = slot
+
+    def advance(self, now):
+        """Moves the clock to time now. Returns [(key, payload)] of the timers that fired, earliest first."""
+        target = int(now // self.tick)
+        fired = list(self.__due.items())
+        self.__due.clear()
+        while self.__now < target and self.__where:
+            self.__now += 1
+            if self.__now % self.__spans[-1] == 0:
+                cascade = [self.__overflow]
+            else:
+                cascade = []
+            for level in range(self.levels - 1, 0, -1):  # Coarse slots that start now spread over finer wheels
+                if self.__now % self.__spans[level] == 0:
+                    cascade.append(self.__wheels[level][self.__now // self.__spans[level] % self.slots])
+            for slot in cascade:
+                timers = list(slot.items())
+                slot.clear()
+                for key, (at, payload) in timers:
+                    self._place(key, at, payload)
+            slot = self.__wheels[0][self.__now % self.slots]
+            fired += slot.items()
+            fired += self.__due.items()
+            slot.clear()
+            self.__due.clear()
+        self.__now = max(self.__now, target)  # Nothing left to fire on the way
+        for key, _ in fired:
+            del self.__where[key]
+        fired.sort(key=lambda timer: timer[1][0])
+        return [(key, payload) for key, (_, payload) in fired]
+
+
+class ReminderScheduler:
+    """Fires 'due today' and 'overdue' reminders for tasks from their due dates. Every pending task with a due
+    date has two timers on a TimerWheel: the start of its due day and the start of the day after. A background
+    thread advances the wheel once per tick, the task list itself is never scanned."""
+
+    def __init__(self, on_reminders, clock=time.time, tick=60):
+        self.on_reminders = on_reminders  # Called with [(kind, task ID)] whenever reminders fire
+        self.clock = clock  # Seconds since the epoch, replaceable in tests
+        self.tick = tick
+        self.__wheel = TimerWheel(tick, clock())
+        self.__midnights = {}  # Key: date, Value: timestamp of its local midnight
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def __len__(self):
+        return len(self.__wheel)
+
+    def _start_of(self, day):
+        if day not in self.__midnights:  # Many tasks share a due date, the time zone lookup is done once per day
+            self.__midnights[day] = datetime.combine(day, datetime.min.time()).timestamp()
+        return self.__midnights[day]
+
+    def schedule_task(self, task_id, due_date):
+        day_after = self._start_of(due_date + timedelta(days=1))
+        with self.__lock:
+            if self.clock() < day_after:  # Already overdue tasks only get the overdue reminder
+                self.__wheel.schedule((task_id, 'due today'), self._start_of(due_date), (task_id, 'due today'))
+            self.__wheel.schedule((task_id, 'overdue'), day_after, (task_id, 'overdue'))
+
+    def cancel_task(self, task_id):
+        with self.__lock:
+            self.__wheel.cancel((task_id, 'due today'))
+            self.__wheel.cancel((task_id, 'overdue'))
+
+    def poll(self):
+        """Fires the reminders that came due since the last poll. Returns them as [(task ID, kind)]."""
+        with self.__lock:
+            fired = [payload for _, payload in self.__wheel.advance(self.clock())]
+        if fired:
+            self.on_reminders(fired)
+        return fired
+
+    def start(self):
+        """Polls in a background thread, once per tick"""
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self._run, daemon=True)
+        self.__thread.start()
+
+    def _run(self):
+        while not self.__stop.wait(self.tick):
+            self.poll()
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__stop.set()
+            self.__thread.join()
+            self.__thread = None
+
+
+# Load existing tasks: the snapshot, then the journal replayed on top of it
 def load_tasks():
+    global last_seq, journal_lines, journal, task_index
+    tasks, next_id = [], 1
     try:
         with open(TASK_FILE, "r") as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []  # Return empty list if file is missing or corrupted
+            snapshot = json.load(file)
+        if isinstance(snapshot, list):  # Files written before the journal existed
+            snapshot = {'seq': 0, 'tasks': snapshot}
+        last_seq, tasks = snapshot['seq'], snapshot['tasks']
+        next_id = snapshot.get('next_id', 1)  # IDs of deleted tasks are never given out again
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, KeyError, TypeError):
+        back_up_corrupt(TASK_FILE)
+        last_seq, tasks = 0, []
+    task_index = TaskIndex()
+    task_index.next_id = next_id
+    for task in tasks:  # Tasks saved before they had IDs get them in list order
+        task.setdefault('ID', task_index.next_id)
+        task_index.add(task)
+    tasks = {task['ID']: task for task in tasks}
+
+    journal_lines = 0
+    try:
+        with open(JOURNAL_FILE, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        data = b''
+    offset = 0
+    while offset < len(data):
+        end = data.find(b'\n', offset)
+        if end == -1:  # The last change was cut off while it was written: it never happened
+            break
+        try:
+            change = json.loads(data[offset:end])
+            if change['seq'] > last_seq:
+                if change['seq'] != last_seq + 1:
+                    raise ValueError('The journal does not continue the snapshot')
+                apply_change(tasks, task_index, change)
+                last_seq = change['seq']
+                journal_lines += 1
+        except (ValueError, KeyError, IndexError, TypeError):  # json.JSONDecodeError is a ValueError
+            back_up_corrupt(JOURNAL_FILE, keep_original=True)
+            break
+        offset = end + 1
+    if offset < len(data):
+        with open(JOURNAL_FILE, "r+b") as file:
+            file.truncate(offset)  # Later changes go after the last good line
+    journal = open(JOURNAL_FILE, "a", encoding="utf-8")
+    return tasks
+
+
+# Save one change: append it to the journal
+def record_change(change):
+    global last_seq, journal_lines
+    apply_change(to_do_list, task_index, change)
+    if reminders is not None:
+        update_reminders(change)
+    last_seq += 1
+    change['seq'] = last_seq
+    journal.write(json.dumps(change, default=str) + '\n')
+    journal.flush()  # In the operating system's hands now, so killing the app can not lose it
+    journal_lines += 1
+    if journal_lines >= max(COMPACT_AFTER, len(to_do_list) // 2):  # Rewriting the list costs O(1) per change on average
+        compact_tasks()
+
+
+# Save the whole list as the new snapshot and empty the journal
+def compact_tasks():
+    global journal_lines
+    temporary = TASK_FILE + '.tmp'
+    with open(temporary, "w") as file:
+        json.dump({'seq': last_seq, 'next_id': task_index.next_id, 'tasks': list(to_do_list.values())}, file,
+                  default=str)  # Convert datetime to string
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, TASK_FILE)  # Old snapshot or new one, never half of one
+    journal.truncate(0)  # Its changes are in the snapshot now (a crash before this is fine: they are skipped by seq)
+    journal_lines = 0
+
+
+def close_tasks():
+    """Forces the journal to disk and closes it"""
+    journal.flush()
+    os.fsync(journal.fileno())
+    journal.close()
 
-# Save tasks to file
-def save_tasks():
-    with open(TASK_FILE, "w") as file:
-        json.dump(to_do_list, file, indent=4, default=str)  # Convert datetime to string
 
 # Initialize task list
-to_do_list = load_tasks()
+to_do_list = load_tasks()  # Key: task ID, Value: task, in the order the tasks were added
 
 
 def add_task():
@@ -28,7 +391,8 @@ def add_task():
     optional_due_date = input('Please input optional due date (format: YYYY-MM-DD) or leave blank: ').strip()
 
     task_data = {
-        'Task name': task.lower(),
+        'ID': task_index.next_id,
+        'Task name': ' '.join(task.lower().split()),
         'Description': description,
         'Status': 'Pending'
     }
@@ -39,8 +403,7 @@ def add_task():
         except ValueError:
             print('Invalid date format! Task added without due date.')
 
-    to_do_list.append(task_data)
-    save_tasks()  # Save after adding a task
+    record_change({'op': 'add', 'task': task_data})
 
 
 def view_all_tasks():
@@ -50,17 +413,17 @@ def view_all_tasks():
         return
 
     print("\n📋 TO-DO LIST 📋\n" + "=" * 30)
-    pending = 0
-    completed = 0
+    completed = task_index.completed_count
+    pending = len(to_do_list) - completed
     today = date.today()
 
-    for index, item in enumerate(to_do_list, start=1):
-        print(f'\n🔹 {index}. Task name: {item["Task name"]}')
+    for index, item in enumerate(to_do_list.values(), start=1):
+        print(f'\n🔹 {index}. Task name: {item["Task name"]} (ID: {item["ID"]})')
         print(f' 📖 Description: {item["Description"]}')
         print(f' 📌 Status: {item["Status"]}')
 
-        if 'Due Date' in item:
-            due_date = date.fromisoformat(item["Due Date"])
+        due_date = task_index.due_dates.get(item['ID'])
+        if due_date is not None:
             print(f' 📅 Due Date: {due_date}')
 
             if due_date < today:
@@ -70,49 +433,102 @@ def view_all_tasks():
             else:
                 print('🟢 On track!')
 
-        if item['Status'] == 'Pending':
-            pending += 1
-        else:
-            completed += 1
-
     print(f'\n🔵 You have {pending} Pending task(s).')
     print(f'🟢 You have completed {completed} task(s).')
 
 
+def find_task(task_name, action):
+    """The ID of the one task a name, some words of a name or an ID refer to. Asks which one if several match."""
+    query = task_name.strip().lstrip('#')
+    if query.isdigit() and int(query) in to_do_list:
+        return int(query)
+    matches = task_index.find(query)
+    if len(matches) > 1:
+        print(f'Several tasks match "{task_name}":')
+        for task_id in matches:
+            print(f' ID {task_id}: {to_do_list[task_id]["Task name"]} ({to_do_list[task_id]["Status"]})')
+        choice = input(f'Enter the ID of the task to {action}: ').strip().lstrip('#')
+        return int(choice) if choice.isdigit() and int(choice) in matches else None
+    return matches[0] if matches else None
+
+
 def mark_task_completed(task_name):
     """Mark a task as completed."""
-    for task in to_do_list:
-        if task_name.lower() in task['Task name']:
-            task['Status'] = 'Completed'
-            save_tasks()  # Save changes
-            print(f'Task: {task_name} marked as completed!')
-            return
-    print('Task name not found!')
+    task_id = find_task(task_name, 'mark as completed')
+    if task_id is None:
+        print('Task name not found!')
+        return
+    record_change({'op': 'complete', 'id': task_id})
+    print(f'Task: {to_do_list[task_id]["Task name"]} marked as completed!')
 
 
 def delete_task(task_name):
     """Delete a task by name."""
-    global to_do_list
-    original_length = len(to_do_list)
-    to_do_list = [task for task in to_do_list if task_name.lower() not in task['Task name']]
-
-    if len(to_do_list) < original_length:
-        save_tasks()  # Save after deletion
-        print(f'Task: {task_name} was removed!')
-    else:
+    task_id = find_task(task_name, 'delete')
+    if task_id is None:
         print('Task not found!')
+        return
+    name = to_do_list[task_id]['Task name']
+    record_change({'op': 'delete', 'ids': [task_id]})
+    print(f'Task: {name} was removed!')
 
 
 def remove_completed_tasks():
     """Remove all completed tasks from the list."""
-    global to_do_list
-    to_do_list = [task for task in to_do_list if task['Status'] != 'Completed']
-    save_tasks()  # Save after removing tasks
+    record_change({'op': 'remove_completed'})
     print('\n✅ All completed tasks removed!')
 
 
+def view_due_tasks():
+    """Display overdue tasks and tasks due today."""
+    today = date.today()
+    overdue, due_today = task_index.overdue(today), task_index.due_on(today)
+    if not overdue and not due_today:
+        print('\n🟢 Nothing is overdue or due today!')
+        return
+    for title, ids in (('❌ OVERDUE', overdue), ('⚠️ DUE TODAY', due_today)):
+        if ids:
+            print(f'\n{title} ({len(ids)})')
+            for task_id in ids:
+                print(f' ID {task_id}: {to_do_list[task_id]["Task name"]} - 📅 {task_index.due_dates[task_id]}')
+    print(f'\n🔵 You have {len(to_do_list) - task_index.completed_count} Pending task(s).')
+
+
+def show_reminders(fired):
+    """Prints the reminders that just fired (a few names per kind, so a long list does not flood the screen)"""
+    for kind, icon in (('due today', '⚠️'), ('overdue', '❌')):
+        tasks = [to_do_list.get(task_id) for task_id, fired_kind in fired if fired_kind == kind]
+        names = [task['Task name'] for task in tasks if task is not None]  # None: deleted meanwhile by the main thread
+        if names:
+            more = f' and {len(names) - 5} more' if len(names) > 5 else ''
+            print(f'\n⏰ {icon} {len(names)} task(s) {kind}: {", ".join(names[:5])}{more}')
+
+
+def start_reminders(clock=time.time):
+    """Schedules a reminder for every pending task with a due date and starts the scheduler"""
+    global reminders
+    reminders = ReminderScheduler(show_reminders, clock)
+    for task_id, due_date in task_index.due_dates.items():
+        if not task_index.is_completed(task_id):
+            reminders.schedule_task(task_id, due_date)
+    reminders.poll()  # What is already due shows before the menu, the thread handles the rest
+    reminders.start()
+
+
+def update_reminders(change):
+    """Keeps the reminders in step with a change to the tasks"""
+    if change['op'] == 'add' and change['task']['ID'] in task_index.due_dates:
+        reminders.schedule_task(change['task']['ID'], task_index.due_dates[change['task']['ID']])
+    elif change['op'] == 'complete':
+        reminders.cancel_task(change['id'])
+    elif change['op'] == 'delete':
+        for task_id in change['ids']:
+            reminders.cancel_task(task_id)
+
+
 def to_do_list_app():
     """Main loop for the to-do list program."""
+    start_reminders()
     while True:
         print('\nOptions:')
         print('1. Add a task')
@@ -120,27 +536,32 @@ def to_do_list_app():
         print('3. Mark a task as completed')
         print('4. Delete a task')
         print('5. Remove all completed tasks')
-        print('6. Exit the app')
+        print('6. Show overdue and due today')
+        print('7. Exit the app')
 
-        choice = input('Choose an option (1-6): ').strip()
+        choice = input('Choose an option (1-7): ').strip()
 
         if choice == '1':
             add_task()
         elif choice == '2':
             view_all_tasks()
         elif choice == '3':
-            task_name = input('Enter the task name to mark as completed: ').strip()
+            task_name = input('Enter the task name or ID to mark as completed: ').strip()
             mark_task_completed(task_name)
         elif choice == '4':
-            task_name = input('Enter the task name to delete: ').strip()
+            task_name = input('Enter the task name or ID to delete: ').strip()
             delete_task(task_name)
         elif choice == '5':
             remove_completed_tasks()
         elif choice == '6':
+            view_due_tasks()
+        elif choice == '7':
+            reminders.stop()
+            close_tasks()
             print('Goodbye!')
             break
         else:
-            print('❌ Invalid choice! Please enter a number between 1 and 6.')
+            print('❌ Invalid choice! Please enter a number between 1 and 7.')
 
 # Start the app
 to_do_list_app()